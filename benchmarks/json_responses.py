@@ -0,0 +1,87 @@
+"""
+Benchmarks rendering a page of 100 posts with the stdlib `json` based
+`JSONResponse` against orjson and pydantic's own serializer.
+
+Run it with `python -m benchmarks.json_responses`.
+"""
+
+import argparse
+import timeit
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from posts_app import schemas
+from posts_app.api.routers.posts import posts_list_adapter
+
+
+def get_posts_list(count: int = 100) -> schemas.PostsList:
+    """Returns a page of `count` posts shaped like a real listing."""
+    now = datetime.now(timezone.utc)
+    owner = {"id": uuid4(), "email": "owner@example.com"}
+    data = [
+        {
+            "post": {
+                "id": uuid4(),
+                "title": f"Post number {number}",
+                "content": "Lorem ipsum dolor sit amet. " * 20,
+                "published": True,
+                "created_at": now,
+                "updated_at": now,
+                "user": owner,
+            },
+            "votes": number,
+        }
+        for number in range(count)
+    ]
+    metadata = {
+        "links": {
+            "next": "http://localhost:8000/api/posts/?cursor=next",
+            "previous": None,
+        },
+        "status_code": 200,
+        "count": count,
+        "total_count": count * 10,
+        "total_count_estimated": True,
+        "total_pages": 10,
+        "current_page": 1,
+    }
+
+    return schemas.PostsList.model_validate(
+        {"data": data, "metadata": metadata}
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--posts", type=int, default=100)
+    parser.add_argument("--number", type=int, default=1000)
+    args = parser.parse_args()
+
+    posts_list = get_posts_list(args.posts)
+    renderers = {
+        # what FastAPI did with the default response class
+        "JSONResponse": lambda: JSONResponse(jsonable_encoder(posts_list)),
+        "ORJSONResponse": lambda: ORJSONResponse(
+            posts_list.model_dump(mode="json")
+        ),
+        "TypeAdapter.dump_json": lambda: posts_list_adapter.dump_json(
+            posts_list
+        ),
+    }
+
+    baseline = None
+    for name, render in renderers.items():
+        seconds = min(timeit.repeat(render, number=args.number, repeat=5))
+        throughput = args.number / seconds
+        baseline = baseline or throughput
+        print(
+            f"{name:<24}{throughput:>10.0f} pages/s"
+            f"{throughput / baseline:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
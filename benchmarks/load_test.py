@@ -0,0 +1,282 @@
+"""
+Load tests the hot paths of the API and reports their latency and
+throughput.
+
+Start the API against a local database, then run
+
+    python -m benchmarks.load_test --users 100 --posts 10000 --votes 50000
+
+The database is topped up with benchmark data first, see `benchmarks.seed`.
+Each endpoint is then hit by `--concurrency` clients for `--duration`
+seconds. The p50, p95 and p99 latencies and the requests per second are
+printed and saved under `benchmarks/results`, in a file named after the
+commit they were measured on, along with the number of server errors and
+requests turned away with a 429. Pass an earlier result as `--baseline` to see
+how every endpoint changed since.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter
+from typing import Awaitable, Callable
+
+import httpx
+
+from benchmarks.seed import BENCHMARK_PASSWORD, get_user_email, seed
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+Request = Callable[[httpx.AsyncClient, "Worker"], Awaitable[httpx.Response]]
+
+
+class Worker:
+    """A simulated client, logged in as one of the benchmark users."""
+
+    def __init__(self, email: str, token: str, post_ids: list[str]):
+        self.email = email
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.post_ids = post_ids
+        # whether this worker's user has voted on each post it tried
+        self.votes: dict[str, bool] = {}
+
+
+async def login(client: httpx.AsyncClient, worker: Worker) -> httpx.Response:
+    return await client.post(
+        "/api/login",
+        data={"username": worker.email, "password": BENCHMARK_PASSWORD},
+    )
+
+
+async def list_posts(
+    client: httpx.AsyncClient, worker: Worker
+) -> httpx.Response:
+    return await client.get("/api/posts/", headers=worker.headers)
+
+
+async def get_post(
+    client: httpx.AsyncClient, worker: Worker
+) -> httpx.Response:
+    post_id = random.choice(worker.post_ids)
+    return await client.get(f"/api/posts/{post_id}", headers=worker.headers)
+
+
+async def vote(client: httpx.AsyncClient, worker: Worker) -> httpx.Response:
+    # toggle votes so requests don't fail on votes seeded before the run
+    post_id = random.choice(worker.post_ids)
+    status = not worker.votes.get(post_id, False)
+    response = await client.post(
+        "/api/vote/",
+        json={"post_id": post_id, "status": status},
+        headers=worker.headers,
+    )
+    # the vote ends up in the requested state whether it was toggled, or
+    # refused because it was already there (400) or already gone (404)
+    if response.status_code in (
+        httpx.codes.CREATED,
+        httpx.codes.BAD_REQUEST,
+        httpx.codes.NOT_FOUND,
+    ):
+        worker.votes[post_id] = status
+    return response
+
+
+async def get_current_user(
+    client: httpx.AsyncClient, worker: Worker
+) -> httpx.Response:
+    return await client.get("/api/users/me", headers=worker.headers)
+
+
+SCENARIOS: dict[str, Request] = {
+    "POST /api/login": login,
+    "GET /api/posts/": list_posts,
+    "GET /api/posts/{id}": get_post,
+    "POST /api/vote/": vote,
+    "GET /api/users/me": get_current_user,
+}
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    """Returns the latency percentiles and throughput of a scenario."""
+    if len(latencies) < 2:
+        percentiles = [latencies[0] if latencies else 0.0] * 99
+    else:
+        percentiles = statistics.quantiles(
+            latencies, n=100, method="inclusive"
+        )
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentiles[49] * 1000,
+        "p95_ms": percentiles[94] * 1000,
+        "p99_ms": percentiles[98] * 1000,
+    }
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    request: Request,
+    workers: list[Worker],
+    duration: float,
+) -> dict:
+    """Sends requests from every worker until the duration is over."""
+    latencies, errors = [], 0
+    deadline = perf_counter() + duration
+
+    async def run_worker(worker: Worker):
+        nonlocal errors
+        while perf_counter() < deadline:
+            start = perf_counter()
+            response = await request(client, worker)
+            latencies.append(perf_counter() - start)
+            # votes toggled the wrong way are answered with a 400 or 404,
+            # only failures of the server itself count
+            if (
+                response.is_server_error
+                or response.status_code == httpx.codes.TOO_MANY_REQUESTS
+            ):
+                errors += 1
+
+    start = perf_counter()
+    await asyncio.gather(*(run_worker(worker) for worker in workers))
+
+    return summarize(latencies, errors, perf_counter() - start)
+
+
+async def get_workers(
+    client: httpx.AsyncClient, users: int, concurrency: int
+) -> list[Worker]:
+    """Logs a benchmark user in for every worker."""
+    emails = [get_user_email(number % users) for number in range(concurrency)]
+    tokens = {}
+    for email in set(emails):
+        response = await client.post(
+            "/api/login",
+            data={"username": email, "password": BENCHMARK_PASSWORD},
+        )
+        response.raise_for_status()
+        tokens[email] = response.json()["access_token"]
+
+    response = await client.get(
+        "/api/posts/",
+        params={"limit": 1000},
+        headers={"Authorization": f"Bearer {tokens[emails[0]]}"},
+    )
+    response.raise_for_status()
+    post_ids = [post["post"]["id"] for post in response.json()["data"]]
+
+    return [Worker(email, tokens[email], post_ids) for email in emails]
+
+
+async def run(args: argparse.Namespace) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(
+        base_url=args.base_url, limits=limits, timeout=60
+    ) as client:
+        workers = await get_workers(client, args.users, args.concurrency)
+        results = {}
+        for name, request in SCENARIOS.items():
+            if args.only and name not in args.only:
+                continue
+            results[name] = await run_scenario(
+                client, request, workers, args.duration
+            )
+            print_result(name, results[name])
+
+    return results
+
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_result(name: str, result: dict, baseline: dict | None = None):
+    line = (
+        f"{name:<22}{result['rps']:>9.1f} rps"
+        f"{result['p50_ms']:>9.1f} p50"
+        f"{result['p95_ms']:>9.1f} p95"
+        f"{result['p99_ms']:>9.1f} p99 ms"
+        f"{result['errors']:>6} errors"
+    )
+    if baseline is not None:
+        line += (
+            f"  rps {result['rps'] / baseline['rps'] - 1:+.1%}"
+            f"  p95 {result['p95_ms'] / baseline['p95_ms'] - 1:+.1%}"
+        )
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=10000)
+    parser.add_argument("--votes", type=int, default=50000)
+    parser.add_argument("--no-seed", action="store_true")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument(
+        "--only", action="append", choices=SCENARIOS, metavar="SCENARIO"
+    )
+    parser.add_argument("--baseline", type=Path)
+    args = parser.parse_args()
+
+    if args.users < 1:
+        parser.error("--users must be at least 1")
+    # read before the results of this run can overwrite it
+    baseline = None
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text())
+    if not args.no_seed:
+        seed(users=args.users, posts=args.posts, votes=args.votes)
+
+    results = asyncio.run(run(args))
+
+    commit = get_commit()
+    RESULTS_DIR.mkdir(exist_ok=True)
+    path = RESULTS_DIR / f"{commit}.json"
+    path.write_text(
+        json.dumps(
+            {
+                "commit": commit,
+                "date": datetime.now(timezone.utc).isoformat(),
+                "options": {
+                    "users": args.users,
+                    "posts": args.posts,
+                    "votes": args.votes,
+                    "concurrency": args.concurrency,
+                    "duration": args.duration,
+                },
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+    print(f"\nResults saved to {path}")
+
+    if baseline is not None:
+        print(f"\nCompared to {baseline['commit']}:")
+        for name, result in results.items():
+            if name in baseline["results"]:
+                print_result(name, result, baseline["results"][name])
+
+
+if __name__ == "__main__":
+    main()
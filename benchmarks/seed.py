@@ -0,0 +1,282 @@
+"""
+Generates users, posts and votes to benchmark and scale test the API with.
+
+Run it with, for example,
+
+    python -m benchmarks.seed --users 100000 --posts 5000000 --votes 50000000
+
+Rows are bulk loaded with `COPY` in chunks of `--chunk-size` rows, so
+memory stays flat however many are generated. Every user shares a single
+pre-hashed password: they log in as `bench-<number>@example.com` with the
+password in `BENCHMARK_PASSWORD`.
+
+Activity is skewed like real traffic. Users are ranked by number and posts
+by age, and the odds of picking the one ranked `n` are proportional to
+`1 / n ** skew`. `--user-skew` makes a few power users write most posts
+and cast most votes. `--post-skew` makes a few hot posts collect most
+votes. A skew of 0 spreads activity evenly. Pairs drawn twice are only
+voted once, so heavily skewed runs load fewer votes than asked for.
+
+Seeding again only tops the benchmark data up to the requested sizes.
+Votes are counted in bulk at the end of their load, don't vote through the
+API while it runs.
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator
+from uuid import uuid4
+
+from sqlalchemy import func, select
+
+from posts_app.database import engine
+from posts_app.models import Post, User, Vote
+from posts_app.utils import pwd_context
+
+BENCHMARK_PASSWORD = "benchmark-password"
+CHUNK_SIZE = 100_000
+
+
+def get_user_email(number: int) -> str:
+    return f"bench-{number}@example.com"
+
+
+def get_user_number(email: str) -> int:
+    return int(email.removeprefix("bench-").removesuffix("@example.com"))
+
+
+def get_cumulative_weights(count: int, skew: float) -> list[float]:
+    """Returns the cumulative odds of picking each of `count` ranks."""
+    return list(
+        itertools.accumulate(1 / rank**skew for rank in range(1, count + 1))
+    )
+
+
+def copy_rows(
+    connection,
+    table: str,
+    columns: list[str],
+    rows: Iterable[tuple],
+    chunk_size: int,
+):
+    """Bulk loads rows into a table with `COPY`, one chunk at a time."""
+    rows = iter(rows)
+    with connection.cursor() as cursor:
+        while chunk := list(itertools.islice(rows, chunk_size)):
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(chunk)
+            buffer.seek(0)
+            cursor.copy_expert(
+                f"COPY {table} ({', '.join(columns)}) "
+                "FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+
+
+def pick(
+    population: list, cum_weights: list[float], count: int, chunk_size: int
+) -> Iterator:
+    """Yields `count` weighted picks from a population, a chunk at a time."""
+    while count > 0:
+        size = min(count, chunk_size)
+        yield from random.choices(population, cum_weights=cum_weights, k=size)
+        count -= size
+
+
+def generate_users(start: int, stop: int, password: str) -> Iterator[tuple]:
+    for number in range(start, stop):
+        yield uuid4(), get_user_email(number), password
+
+
+def generate_posts(
+    owners: Iterator, start: int, days: int
+) -> Iterator[tuple]:
+    now = datetime.now(timezone.utc)
+    for number, user_id in enumerate(owners, start):
+        created_at = now - timedelta(seconds=random.uniform(0, days * 86400))
+        yield (
+            uuid4(),
+            f"Benchmark post {number}",
+            f"Content of benchmark post {number}.",
+            user_id,
+            created_at,
+            created_at,
+        )
+
+
+def load_votes(connection, votes: Iterable[tuple], chunk_size: int):
+    """
+    Loads votes through a staging table.
+
+    Skewed pairs repeat, so they are deduplicated on the way in. Counting
+    votes row by row is switched off during the load, and the counts of the
+    voted posts are recomputed once at the end of the same transaction.
+    """
+    votes_table = Vote.__table__.name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TEMPORARY TABLE staged_votes "
+            "(user_id uuid, post_id uuid) ON COMMIT DROP"
+        )
+    copy_rows(
+        connection, "staged_votes", ["user_id", "post_id"], votes, chunk_size
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"ALTER TABLE {votes_table} "
+            "DISABLE TRIGGER votes_update_post_vote_count"
+        )
+        cursor.execute(
+            f"INSERT INTO {votes_table} (user_id, post_id) "
+            "SELECT DISTINCT user_id, post_id FROM staged_votes "
+            "ON CONFLICT DO NOTHING"
+        )
+        cursor.execute(
+            f"""
+            UPDATE {Post.__table__.name} AS posts
+            SET vote_count = counts.vote_count
+            FROM (
+                SELECT post_id, count(*) AS vote_count
+                FROM {votes_table}
+                WHERE post_id IN (SELECT post_id FROM staged_votes)
+                GROUP BY post_id
+            ) AS counts
+            WHERE posts.id = counts.post_id
+            """
+        )
+        cursor.execute(
+            f"ALTER TABLE {votes_table} "
+            "ENABLE TRIGGER votes_update_post_vote_count"
+        )
+
+
+def seed(
+    users: int,
+    posts: int,
+    votes: int,
+    *,
+    user_skew: float = 1.0,
+    post_skew: float = 1.0,
+    days: int = 365,
+    chunk_size: int = CHUNK_SIZE,
+):
+    """Tops the database up to the given number of benchmark rows."""
+    bench_users = select(User.id).filter(User.email.like(get_user_email("%")))
+    connection = engine.raw_connection()
+    try:
+        with engine.connect() as sa_connection:
+            emails = sa_connection.scalars(
+                select(User.email).filter(
+                    User.email.like(get_user_email("%"))
+                )
+            ).all()
+        # hashing once is enough, every user shares the password
+        password = pwd_context.hash(BENCHMARK_PASSWORD)
+        copy_rows(
+            connection,
+            User.__table__.name,
+            ["id", "email", "password"],
+            generate_users(
+                max(map(get_user_number, emails), default=-1) + 1,
+                users,
+                password,
+            ),
+            chunk_size,
+        )
+        connection.commit()
+
+        with engine.connect() as sa_connection:
+            # power users are the lowest numbered ones
+            user_ids = [
+                row.id
+                for row in sorted(
+                    sa_connection.execute(
+                        select(User.id, User.email).filter(
+                            User.id.in_(bench_users)
+                        )
+                    ),
+                    key=lambda row: get_user_number(row.email),
+                )
+            ]
+            existing_posts = sa_connection.scalar(
+                select(func.count()).filter(Post.user_id.in_(bench_users))
+            )
+        user_weights = get_cumulative_weights(len(user_ids), user_skew)
+
+        owners = pick(
+            user_ids, user_weights, max(posts - existing_posts, 0), chunk_size
+        )
+        copy_rows(
+            connection,
+            Post.__table__.name,
+            ["id", "title", "content", "user_id", "created_at", "updated_at"],
+            generate_posts(owners, existing_posts, days),
+            chunk_size,
+        )
+        connection.commit()
+
+        with engine.connect() as sa_connection:
+            # hot posts are the newest ones
+            post_ids = sa_connection.scalars(
+                select(Post.id)
+                .filter(Post.user_id.in_(bench_users))
+                .order_by(Post.created_at.desc())
+            ).all()
+            existing_votes = sa_connection.scalar(
+                select(func.count()).filter(Vote.user_id.in_(bench_users))
+            )
+        post_weights = get_cumulative_weights(len(post_ids), post_skew)
+
+        new_votes = max(votes - existing_votes, 0) if post_ids else 0
+        if new_votes:
+            voters = pick(user_ids, user_weights, new_votes, chunk_size)
+            voted_posts = pick(post_ids, post_weights, new_votes, chunk_size)
+            load_votes(connection, zip(voters, voted_posts), chunk_size)
+
+        with connection.cursor() as cursor:
+            # estimated counts of posts read the planner's statistics
+            for table in (User.__table__, Post.__table__, Vote.__table__):
+                cursor.execute(f"ANALYZE {table.name}")
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--votes", type=int, default=1_000_000)
+    parser.add_argument("--user-skew", type=float, default=1.0)
+    parser.add_argument("--post-skew", type=float, default=1.0)
+    parser.add_argument(
+        "--days",
+        type=int,
+        default=365,
+        help="how far back the creation dates of posts go",
+    )
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    if args.users < 1:
+        parser.error("--users must be at least 1")
+
+    seed(
+        users=args.users,
+        posts=args.posts,
+        votes=args.votes,
+        user_skew=args.user_skew,
+        post_skew=args.post_skew,
+        days=args.days,
+        chunk_size=args.chunk_size,
+    )
+
+
+if __name__ == "__main__":
+    main()
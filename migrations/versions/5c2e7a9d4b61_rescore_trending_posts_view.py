@@ -0,0 +1,73 @@
+"""Score trending_posts from a fixed epoch
+
+Revision ID: 5c2e7a9d4b61
+Revises: 9b1c7e3d2f40
+Create Date: 2024-11-19 09:21:13.448019
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5c2e7a9d4b61"
+down_revision: Union[str, None] = "9b1c7e3d2f40"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS trending_posts")
+    op.execute(
+        """
+        CREATE MATERIALIZED VIEW trending_posts AS
+        SELECT
+            id AS post_id,
+            (
+                log(vote_count)
+                + extract(epoch FROM created_at - '2024-01-01 00:00+00')
+                / 45000
+            )::double precision AS score
+        FROM posts
+        WHERE vote_count > 0 AND created_at > now() - interval '7 days'
+        """
+    )
+    # the unique index lets the view be refreshed concurrently
+    op.execute(
+        "CREATE UNIQUE INDEX ix_trending_posts_post_id "
+        "ON trending_posts (post_id)"
+    )
+    op.execute(
+        "CREATE INDEX ix_trending_posts_score_post_id "
+        "ON trending_posts (score, post_id)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS trending_posts")
+    op.execute(
+        """
+        CREATE MATERIALIZED VIEW trending_posts AS
+        SELECT
+            id AS post_id,
+            score,
+            row_number() OVER (ORDER BY score DESC, id) AS rank
+        FROM (
+            SELECT
+                id,
+                vote_count / power(
+                    extract(epoch FROM now() - created_at) / 3600 + 2, 1.8
+                )::double precision AS score
+            FROM posts
+            WHERE vote_count > 0 AND created_at > now() - interval '7 days'
+        ) AS scored_posts
+        """
+    )
+    op.execute(
+        "CREATE UNIQUE INDEX ix_trending_posts_post_id "
+        "ON trending_posts (post_id)"
+    )
+    op.execute(
+        "CREATE UNIQUE INDEX ix_trending_posts_rank ON trending_posts (rank)"
+    )
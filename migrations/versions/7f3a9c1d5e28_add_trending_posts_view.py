@@ -0,0 +1,50 @@
+"""Add trending_posts materialized view
+
+Revision ID: 7f3a9c1d5e28
+Revises: c4d8e2f61a37
+Create Date: 2024-11-12 10:04:51.630217
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7f3a9c1d5e28"
+down_revision: Union[str, None] = "c4d8e2f61a37"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE MATERIALIZED VIEW trending_posts AS
+        SELECT
+            id AS post_id,
+            score,
+            row_number() OVER (ORDER BY score DESC, id) AS rank
+        FROM (
+            SELECT
+                id,
+                vote_count / power(
+                    extract(epoch FROM now() - created_at) / 3600 + 2, 1.8
+                )::double precision AS score
+            FROM posts
+            WHERE vote_count > 0 AND created_at > now() - interval '7 days'
+        ) AS scored_posts
+        """
+    )
+    # the unique index lets the view be refreshed concurrently
+    op.execute(
+        "CREATE UNIQUE INDEX ix_trending_posts_post_id "
+        "ON trending_posts (post_id)"
+    )
+    op.execute(
+        "CREATE UNIQUE INDEX ix_trending_posts_rank ON trending_posts (rank)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS trending_posts")
@@ -0,0 +1,67 @@
+"""Add vote_count field to posts table
+
+Revision ID: 8d2f4b6e1a90
+Revises: 3c9e1f7a2b4d
+Create Date: 2024-11-04 09:31:07.218455
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8d2f4b6e1a90"
+down_revision: Union[str, None] = "3c9e1f7a2b4d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "posts",
+        sa.Column(
+            "vote_count", sa.Integer(), server_default="0", nullable=False
+        ),
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_post_vote_count()
+        RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE posts SET vote_count = vote_count + 1
+                WHERE id = NEW.post_id;
+                RETURN NEW;
+            END IF;
+            UPDATE posts SET vote_count = vote_count - 1
+            WHERE id = OLD.post_id;
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER votes_update_post_vote_count
+        AFTER INSERT OR DELETE ON votes
+        FOR EACH ROW EXECUTE FUNCTION update_post_vote_count()
+        """
+    )
+    # backfill once the trigger is in place so no new vote is missed
+    op.execute(
+        """
+        UPDATE posts SET vote_count = counts.votes
+        FROM (
+            SELECT post_id, count(*) AS votes FROM votes GROUP BY post_id
+        ) AS counts
+        WHERE posts.id = counts.post_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS votes_update_post_vote_count ON votes")
+    op.execute("DROP FUNCTION IF EXISTS update_post_vote_count()")
+    op.drop_column("posts", "vote_count")
@@ -0,0 +1,70 @@
+from typing import Any
+
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from posts_app import metrics
+
+
+class InstrumentedORJSONResponse(ORJSONResponse):
+    """ORJSONResponse adding its rendering to the request's timings."""
+
+    def render(self, content: Any) -> bytes:
+        with metrics.track_serialization():
+            return super().render(content)
+
+
+class InstrumentationMiddleware:
+    """
+    Records where the time handling each request goes.
+
+    The total time, the time spent on database queries and their number,
+    and the time spent serializing the response are sent back in the
+    `Server-Timing` header and recorded in the metrics served at
+    `/api/metrics`.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = metrics.RequestTimings()
+        token = metrics.request_timings.set(timings)
+        status_code = 500
+
+        async def send_with_timings(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", timings.get_server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            metrics.request_timings.reset(token)
+            # label requests by their route rather than their path, so ids in
+            # paths don't make a new series each
+            route = scope.get("route")
+            labels = {
+                "method": scope["method"],
+                "route": route.path if route is not None else "unmatched",
+            }
+            metrics.http_request_seconds.labels(
+                **labels, status_code=status_code
+            ).observe(timings.total_seconds)
+            metrics.http_request_db_seconds.labels(**labels).observe(
+                timings.db_seconds
+            )
+            metrics.http_request_db_queries.labels(**labels).observe(
+                timings.db_queries
+            )
+            metrics.http_request_serialization_seconds.labels(
+                **labels
+            ).observe(timings.serialization_seconds)
@@ -1,13 +1,46 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from dotenv import load_dotenv
-from fastapi import APIRouter, FastAPI
+from fastapi import APIRouter, FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from posts_app import schemas
-from posts_app.api.routers import UserDependency, auth, posts, users, votes
+from posts_app.api.instrumentation import (
+    InstrumentationMiddleware,
+    InstrumentedORJSONResponse,
+)
+from posts_app.api.routers import (
+    UserDependency,
+    auth,
+    follows,
+    posts,
+    users,
+    votes,
+)
 from posts_app.config import settings
 
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # every worker schedules refreshes, only one runs at a time
+    refresher = None
+    if settings.trending_refresh_interval > 0:
+        refresher = asyncio.create_task(
+            posts.refresh_trending_posts(settings.trending_refresh_interval)
+        )
+
+    yield
+
+    if refresher is not None:
+        refresher.cancel()
+        with suppress(asyncio.CancelledError):
+            await refresher
+
+
 if settings.dev:
     servers = {"url": "http://localhost:8000"}
 else:
@@ -34,6 +67,9 @@ app = FastAPI(
     "delete posts and users.",
     redoc_url="/api/docs",
     docs_url="/api/interactive-docs",
+    # responses of endpoints returning models are serialized with orjson
+    default_response_class=InstrumentedORJSONResponse,
+    lifespan=lifespan,
 )
 
 # allow everyone for now
@@ -46,12 +82,15 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# added last so it wraps every other middleware
+app.add_middleware(InstrumentationMiddleware)
 router = APIRouter(prefix="/api")
 
 router.include_router(users.router)
 router.include_router(posts.router, dependencies=[UserDependency])
 router.include_router(auth.router)
 router.include_router(votes.router)
+router.include_router(follows.router)
 
 
 @router.get(
@@ -66,4 +105,15 @@ def get_api_status():
     return {"status": "OK"}
 
 
+@router.get(
+    "/metrics",
+    response_class=Response,
+    summary="API metrics",
+    tags=["Status"],
+)
+def get_api_metrics():
+    """This endpoint returns the API metrics in the Prometheus format."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 app.include_router(router)
@@ -2,6 +2,7 @@ from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
 
 from posts_app import models, oauth2, schemas
 from posts_app.api.routers.deps import DBSessionDependency
@@ -12,14 +13,12 @@ router = APIRouter(tags=["Authentication"])
 
 
 @router.post("/login", response_model=schemas.Token)
-def login(
+async def login(
     user_credentials: Annotated[OAuth2PasswordRequestForm, Depends()],
     db: DBSessionDependency,
 ) -> schemas.Token:
-    user = (
-        db.query(models.User)
-        .filter_by(email=user_credentials.username)
-        .first()
+    user = await db.scalar(
+        select(models.User).filter_by(email=user_credentials.username)
     )
 
     if not user:
@@ -28,7 +27,7 @@ def login(
             status_code=status.HTTP_400_BAD_REQUEST,
         )
 
-    if not is_valid_password(
+    if not await is_valid_password(
         plain_password=user_credentials.password,
         hashed_password=user.password,
     ):
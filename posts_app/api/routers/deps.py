@@ -1,10 +1,13 @@
 from typing import Annotated
 
 from fastapi import Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from posts_app.database import get_db
+from posts_app.database import get_db, get_session_factory
 from posts_app.utils import get_query_params
 
 QueryParamsDependency = Annotated[dict, Depends(get_query_params)]
-DBSessionDependency = Annotated[Session, Depends(get_db)]
+DBSessionDependency = Annotated[AsyncSession, Depends(get_db)]
+SessionFactoryDependency = Annotated[
+    async_sessionmaker, Depends(get_session_factory)
+]
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, status
+
+from posts_app import schemas
+from posts_app.api.routers import CurrentUserDependency, UserDependency
+from posts_app.api.routers.deps import DBSessionDependency
+from posts_app.crud import crud_follow
+
+router = APIRouter(
+    prefix="/follow", tags=["Follow"], dependencies=[UserDependency]
+)
+
+
+@router.post("/", status_code=status.HTTP_201_CREATED)
+async def follow_or_unfollow_user(
+    follow: schemas.Follow,
+    current_user: CurrentUserDependency,
+    db: DBSessionDependency,
+) -> dict[str, str]:
+    """
+    This endpoint allows users to follow another user, whose posts then
+    show up in their home timeline, or to unfollow them.
+    """
+    return await crud_follow.create_or_delete(
+        db=db, follow=follow, user_id=current_user.id
+    )
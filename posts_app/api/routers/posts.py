@@ -1,51 +1,125 @@
-from typing import Any
+import asyncio
+import csv
+import io
+from datetime import datetime
+from typing import Any, AsyncIterator, Literal, Sequence
+from urllib.parse import urlencode
 
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy.engine.row import Row
 
 from posts_app import schemas
 from posts_app.api.routers import CurrentUserDependency
 from posts_app.api.routers.deps import (
     DBSessionDependency,
     QueryParamsDependency,
+    SessionFactoryDependency,
 )
+from posts_app.cache import post_cache, post_list_cache
+from posts_app.config import settings
 from posts_app.crud import crud_post
-from posts_app.schemas import MetaData
+from posts_app.database import AsyncDBSession
+from posts_app.metrics import (
+    track_serialization,
+    trending_refresh_failures,
+    trending_refreshed_at,
+)
+from posts_app.utils import get_json_response
 
 router = APIRouter(prefix="/posts", tags=["Posts"])
 
+# adapters serialize responses straight to JSON bytes
+posts_adapter = TypeAdapter(list[schemas.PostResponse])
+post_adapter = TypeAdapter(schemas.PostResponse)
+posts_list_adapter = TypeAdapter(schemas.PostsList)
+timeline_adapter = TypeAdapter(schemas.Timeline)
+
+
+def get_post_data(rows: Sequence[Row]) -> list[dict[str, Any]]:
+    """Returns the data for posts selected as plain rows."""
+    return [
+        {
+            "post": {
+                "id": row.id,
+                "title": row.title,
+                "content": row.content,
+                "published": row.published,
+                "created_at": row.created_at,
+                "updated_at": row.updated_at,
+                "user": {"id": row.user_id, "email": row.user_email},
+            },
+            "votes": row.votes,
+        }
+        for row in rows
+    ]
 
-def get_post_data(posts_data: list[tuple]) -> list[dict[str, Any]]:
-    """Returns the data for the posts."""
-    data = []
-    for post, votes in posts_data:
-        data.append(
-            {
-                "post": post,
-                "votes": votes,
-            }
-        )
-    return data
+
+def get_page_url(request: Request, page: dict[str, Any] | None) -> str | None:
+    """Returns the url of a page from its pagination parameters."""
+    if page is None:
+        return None
+    url = request.url.remove_query_params(["cursor", "skip"])
+    return str(url.include_query_params(**page))
+
+
+def get_metadata(
+    request: Request, count: int, pagination: dict[str, Any]
+) -> schemas.MetaData:
+    """Returns the metadata of a page of posts from its pagination."""
+    return schemas.MetaData(
+        links=schemas.Link(
+            next=get_page_url(request, pagination["next"]),
+            previous=get_page_url(request, pagination["previous"]),
+        ),
+        status_code=status.HTTP_200_OK,
+        count=count,
+        total_count=pagination["total_count"],
+        total_count_estimated=pagination["total_count_estimated"],
+        total_pages=pagination["total_pages"],
+        current_page=pagination["current_page"],
+    )
 
 
 @router.get("/", response_model=schemas.PostsList)
 async def get_posts(
+    request: Request,
     query_params: QueryParamsDependency,
     db: DBSessionDependency,
-) -> dict[str, list[dict[str, Any]] | MetaData]:
-    """Retrieves all the posts created by current active users."""
-    posts_data = crud_post.get_all(db=db, **query_params)
+) -> Response:
+    """
+    Retrieves all the posts created by current active users.
 
-    data = get_post_data(posts_data)
+    Posts are paginated with opaque cursors, follow the `next` and
+    `previous` links in the metadata to move between pages.
 
-    metadata = schemas.MetaData(
-        links=schemas.Link(next=None, previous=None),
-        status_code=status.HTTP_200_OK,
-        count=len(data),
-        total_pages=1,
-        current_page=1,
+    The total number of posts is an estimate unless `count_mode=exact` is
+    passed.
+    """
+    # the links in the metadata depend on the url the API is served from
+    cache_key = (
+        f"{request.base_url}?{urlencode(sorted(query_params.multi_items()))}"
     )
+    cached_response = await post_list_cache.get(cache_key)
+    if cached_response is not None:
+        return get_json_response(request, cached_response)
+
+    posts_data, pagination = await crud_post.get_page(db=db, **query_params)
+
+    data = get_post_data(posts_data)
+
+    metadata = get_metadata(request, len(data), pagination)
+
+    with track_serialization():
+        response = posts_list_adapter.dump_json(
+            posts_list_adapter.validate_python(
+                {"data": data, "metadata": metadata}, from_attributes=True
+            )
+        )
+    await post_list_cache.set(cache_key, response)
 
-    return {"data": data, "metadata": metadata}
+    return get_json_response(request, response)
 
 
 @router.post(
@@ -59,27 +133,278 @@ async def create_post(
     user: CurrentUserDependency,
 ) -> schemas.Post:
     """This endpoint creates a post for the authenticated user."""
-    return crud_post.create(db=db, schema=post, obj_owner_id=user.id)
+    post = await crud_post.create(db=db, schema=post, obj_owner_id=user.id)
+
+    # the owner is the current user, there's no need to load it
+    return schemas.Post(
+        id=post.id,
+        title=post.title,
+        content=post.content,
+        published=post.published,
+        created_at=post.created_at,
+        updated_at=post.updated_at,
+        user=schemas.PostOwner(id=user.id, email=user.email),
+    )
+
+
+@router.post(
+    "/batch",
+    status_code=status.HTTP_201_CREATED,
+    response_model=list[schemas.Post],
+)
+async def create_posts(
+    batch: schemas.PostBatchCreate,
+    db: DBSessionDependency,
+    user: CurrentUserDependency,
+) -> list[dict[str, Any]]:
+    """
+    This endpoint creates up to 1000 posts for the authenticated user in a
+    single transaction.
+    """
+    posts = await crud_post.create_many(
+        db=db, posts=batch.posts, obj_owner_id=user.id
+    )
+    owner = {"id": user.id, "email": user.email}
+
+    return [{**post._asdict(), "user": owner} for post in posts]
+
+
+@router.post("/batch/delete", response_model=schemas.PostBatchDeleteResponse)
+async def delete_posts(
+    batch: schemas.PostBatchDelete,
+    db: DBSessionDependency,
+    user: CurrentUserDependency,
+) -> dict[str, list]:
+    """
+    This endpoint deletes up to 1000 posts of the authenticated user in a
+    single transaction.
+    """
+    deleted = await crud_post.delete_many(
+        db=db, post_ids=batch.ids, user_id=user.id
+    )
+    return {"deleted": deleted}
+
+
+async def export_ndjson(
+    batches: AsyncIterator[Sequence[Row]],
+) -> AsyncIterator[bytes]:
+    """Renders batches of posts as JSON lines."""
+    async for rows in batches:
+        with track_serialization():
+            posts = posts_adapter.validate_python(get_post_data(rows))
+            lines = b"".join(
+                post_adapter.dump_json(post) + b"\n" for post in posts
+            )
+        yield lines
+
+
+async def export_csv(
+    columns: list[str], batches: AsyncIterator[Sequence[Row]]
+) -> AsyncIterator[str]:
+    """Renders batches of posts as CSV, one row per post."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    # the header is sent even when no post matches
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    async for rows in batches:
+        writer.writerows(
+            [
+                value.isoformat() if isinstance(value, datetime) else value
+                for value in row
+            ]
+            for row in rows
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "content": {"application/x-ndjson": {}, "text/csv": {}}
+        }
+    },
+)
+async def export_posts(
+    query_params: QueryParamsDependency,
+    session_factory: SessionFactoryDependency,
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+) -> StreamingResponse:
+    """
+    This endpoint exports every post matching the query parameters, oldest
+    first, as JSON lines or CSV.
+
+    Posts are streamed as they are read from the database, so exports of
+    any size can be downloaded in a single request.
+    """
+    query_fields = {
+        field: value
+        for field, value in query_params.items()
+        if field != "format"
+    }
+    # invalid query parameters are reported before the response starts
+    query = crud_post.get_export_query(**query_fields)
+
+    async def stream_posts() -> AsyncIterator[Sequence[Row]]:
+        # the request's session is closed as soon as the endpoint returns,
+        # before the response is sent, the export reads through its own
+        async with session_factory() as export_db:
+            async for rows in crud_post.stream(
+                db=export_db,
+                query=query,
+                batch_size=settings.post_export_batch_size,
+            ):
+                yield rows
+
+    if export_format == "csv":
+        return StreamingResponse(
+            export_csv(list(query.selected_columns.keys()), stream_posts()),
+            media_type="text/csv",
+            headers={
+                "Content-Disposition": 'attachment; filename="posts.csv"'
+            },
+        )
+    return StreamingResponse(
+        export_ndjson(stream_posts()), media_type="application/x-ndjson"
+    )
+
+
+@router.get("/trending", response_model=schemas.PostsList)
+async def get_trending_posts(
+    request: Request,
+    query_params: QueryParamsDependency,
+    db: DBSessionDependency,
+) -> Response:
+    """
+    Retrieves the posts gathering the most votes lately, highest ranked
+    first.
+
+    Posts are ranked by their votes and their age among the posts of the
+    last week, paginated with the cursors of the `next` and `previous`
+    links. Scores are recomputed periodically rather than on every vote,
+    see the `TRENDING_REFRESH_INTERVAL` setting.
+    """
+    posts_data, pagination = await crud_post.get_trending(
+        db=db, **query_params
+    )
+
+    data = get_post_data(posts_data)
+
+    metadata = get_metadata(request, len(data), pagination)
+
+    with track_serialization():
+        response = posts_list_adapter.dump_json(
+            posts_list_adapter.validate_python(
+                {"data": data, "metadata": metadata}, from_attributes=True
+            )
+        )
+
+    return get_json_response(request, response)
+
+
+@router.get("/timeline", response_model=schemas.Timeline)
+async def get_timeline(
+    request: Request,
+    query_params: QueryParamsDependency,
+    db: DBSessionDependency,
+    user: CurrentUserDependency,
+) -> Response:
+    """
+    Retrieves the home timeline of the authenticated user, the posts of the
+    users they follow along with their own, newest first.
+
+    Follow the `next` link in the metadata for older posts.
+    """
+    posts_data, pagination = await crud_post.get_timeline(
+        db=db, user_id=user.id, **query_params
+    )
+
+    data = get_post_data(posts_data)
+
+    metadata = schemas.TimelineMetaData(
+        links=schemas.Link(
+            next=get_page_url(request, pagination["next"]), previous=None
+        ),
+        status_code=status.HTTP_200_OK,
+        count=len(data),
+    )
+
+    with track_serialization():
+        response = timeline_adapter.dump_json(
+            timeline_adapter.validate_python(
+                {"data": data, "metadata": metadata}, from_attributes=True
+            )
+        )
+
+    return get_json_response(request, response)
+
+
+async def refresh_trending_posts(interval: float):
+    """Refreshes the trending posts every `interval` seconds, forever."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with AsyncDBSession() as db:
+                refreshed = await crud_post.refresh_trending(db=db)
+                await db.commit()
+        except Exception:
+            # try again on the next round rather than stop refreshing
+            trending_refresh_failures.inc()
+        else:
+            if refreshed:
+                trending_refreshed_at.set_to_current_time()
 
 
 @router.get("/me", response_model=list[schemas.PostResponse])
 async def get_current_user_posts(
+    request: Request,
     db: DBSessionDependency,
     user: CurrentUserDependency,
-) -> list[dict[str, Any]]:
+) -> Response:
     """
     This endpoint retrieves all the posts for the current authenticated
     user.
     """
-    return get_post_data(crud_post.get_all(db=db, **{"user_id": user.id}))
+    data = get_post_data(
+        await crud_post.get_all(db=db, rows=True, **{"user_id": user.id})
+    )
+
+    with track_serialization():
+        response = posts_adapter.dump_json(
+            posts_adapter.validate_python(data)
+        )
+
+    return get_json_response(request, response)
 
 
 @router.get("/{post_id}", response_model=schemas.PostResponse)
-async def get_post(post_id: str, db: DBSessionDependency):
+async def get_post(
+    request: Request, post_id: str, db: DBSessionDependency
+) -> Response:
     """This endpoint returns a single post by its id."""
-    post, votes = crud_post.get_by_id(db=db, post_id=post_id)
+    # responses are cached under the canonical form of the id, so requests
+    # using any other form of it simply miss the cache.
+    cached_response = await post_cache.get(post_id)
+    if cached_response is not None:
+        return get_json_response(request, cached_response)
+
+    post, votes = await crud_post.get_by_id(db=db, post_id=post_id)
 
-    return {"post": post, "votes": votes}
+    with track_serialization():
+        response = post_adapter.dump_json(
+            post_adapter.validate_python(
+                {"post": post, "votes": votes}, from_attributes=True
+            )
+        )
+    await post_cache.set(str(post.id), response)
+
+    return get_json_response(request, response)
 
 
 @router.delete("/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -87,7 +412,7 @@ async def delete_post(
     post_id: str, db: DBSessionDependency, user: CurrentUserDependency
 ):
     """This endpoint deletes a post by its id."""
-    return crud_post.delete(obj_id=post_id, db=db, obj_owner_id=user.id)
+    return await crud_post.delete(post_id=post_id, db=db, user_id=user.id)
 
 
 @router.put("/{post_id}", response_model=schemas.Post)
@@ -98,7 +423,7 @@ async def update_post(
     user: CurrentUserDependency,
 ):
     """Updates a post."""
-    return crud_post.update(
+    return await crud_post.update(
         db=db, schema=post, post_id=post_id, user_id=user.id
     )
 
@@ -111,6 +436,6 @@ async def partial_update_post(
     user: CurrentUserDependency,
 ):
     """Partially updates a user's post."""
-    return crud_post.partial_update(
-        db=db, schema=post, id=post_id, obj_owner_id=user.id
+    return await crud_post.partial_update(
+        db=db, schema=post, post_id=post_id, user_id=user.id
     )
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, HTTPException, Request, status
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from pydantic import TypeAdapter
 
 from posts_app import oauth2, schemas
 from posts_app.api.routers import CurrentUserDependency, UserDependency
@@ -7,9 +8,13 @@ from posts_app.api.routers.deps import (
     QueryParamsDependency,
 )
 from posts_app.crud import crud_user
+from posts_app.metrics import track_serialization
+from posts_app.utils import get_json_response
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
+users_adapter = TypeAdapter(list[schemas.User])
+
 
 @router.get(
     "/",
@@ -18,19 +23,32 @@ router = APIRouter(prefix="/users", tags=["Users"])
     dependencies=[UserDependency],
 )
 async def get_users(
+    request: Request,
     query_params: QueryParamsDependency,
     db: DBSessionDependency,
-):
+) -> Response:
     """Returns a list of users."""
-    return crud_user.get_all(db=db, **query_params)
+    users = await crud_user.get_all(db=db, **query_params)
+    with track_serialization():
+        response = users_adapter.dump_json(
+            users_adapter.validate_python(users, from_attributes=True)
+        )
+
+    return get_json_response(request, response)
 
 
 @router.get("/me", response_model=schemas.User)
 async def get_current_user(
+    request: Request,
     current_user: CurrentUserDependency,
-):
+) -> Response:
     """This endpoint returns the current user."""
-    return current_user
+    with track_serialization():
+        response = current_user.model_dump_json()
+
+    return get_json_response(
+        request, response, last_modified=current_user.updated_at
+    )
 
 
 @router.get(
@@ -39,8 +57,14 @@ async def get_current_user(
     response_description="User retrieved successfully",
     dependencies=[UserDependency],
 )
-async def get_user(user_id: str, db: DBSessionDependency):
-    return crud_user.get_by_id(db=db, obj_id=user_id)
+async def get_user(
+    request: Request, user_id: str, db: DBSessionDependency
+) -> Response:
+    user = await crud_user.get_by_id(db=db, obj_id=user_id)
+    with track_serialization():
+        response = schemas.User.model_validate(user).model_dump_json()
+
+    return get_json_response(request, response, last_modified=user.updated_at)
 
 
 @router.put("/{user_id}", response_model=schemas.User)
@@ -50,7 +74,7 @@ async def update_user(
     db: DBSessionDependency,
     current_user: CurrentUserDependency,
 ):
-    return crud_user.update(
+    return await crud_user.update(
         db=db, schema=user, obj_id=user_id, obj_owner_id=current_user.id
     )
 
@@ -73,7 +97,7 @@ async def create_user(
     # creating  a user
     if bearer_token:
         try:
-            user = oauth2.get_current_user(token=bearer_token, db=db)
+            user = await oauth2.get_current_user(token=bearer_token, db=db)
         except Exception as error:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -89,7 +113,7 @@ async def create_user(
                     detail="You are not authorized to create a user.",
                 )
 
-    return crud_user.create(db=db, schema=user)
+    return await crud_user.create(db=db, schema=user)
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -97,6 +121,6 @@ async def delete_user(
     user_id: str, db: DBSessionDependency, current_user: CurrentUserDependency
 ):
     """This endpoint deletes a user by its id."""
-    return crud_user.delete(
+    return await crud_user.delete(
         obj_id=user_id, db=db, obj_owner_id=current_user.id
     )
@@ -11,12 +11,28 @@ router = APIRouter(
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-def add_or_delete_vote(
+async def add_or_delete_vote(
     vote: schemas.Vote,
     current_user: CurrentUserDependency,
     db: DBSessionDependency,
 ) -> dict[str, str]:
     """This endpoint allows user to vote on a post."""
-    return crud_vote.create_or_delete(
+    return await crud_vote.create_or_delete(
         db=db, vote=vote, user_id=current_user.id
     )
+
+
+@router.post("/batch", response_model=schemas.VoteBatchResponse)
+async def add_or_delete_votes(
+    batch: schemas.VoteBatch,
+    current_user: CurrentUserDependency,
+    db: DBSessionDependency,
+) -> dict[str, list]:
+    """
+    This endpoint adds and removes many votes at once, for clients syncing
+    votes made offline. The outcome of each vote is listed in the response.
+    """
+    results = await crud_vote.create_or_delete_many(
+        db=db, votes=batch.votes, user_id=current_user.id
+    )
+    return {"results": results}
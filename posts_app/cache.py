@@ -0,0 +1,208 @@
+import time
+from collections import OrderedDict
+from functools import cache
+from typing import Any, Awaitable, Callable
+from uuid import UUID, uuid4
+
+from redis import asyncio as redis
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from posts_app.config import settings
+
+
+class MemoryCache:
+    """
+    In-process cache with a time to live and least recently used eviction.
+
+    Entries are only visible to the worker process that stored them.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    async def get(self, key: str) -> Any | None:
+        """Returns the value stored for the key, if it hasn't expired."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return None
+
+        self.entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float | None = None):
+        """Stores the value, evicting the least recently used entries."""
+        expires_at = time.monotonic() + (ttl or self.ttl)
+        self.entries[key] = (expires_at, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    async def delete(self, *keys: str):
+        """Removes the keys from the cache."""
+        for key in keys:
+            self.entries.pop(key, None)
+
+    async def clear(self):
+        """Removes every entry from the cache."""
+        self.entries.clear()
+
+
+class RedisCache:
+    """
+    Cache stored in a Redis compatible server and shared by every worker.
+
+    Values must be strings or bytes, eviction beyond the time to live is
+    left to the server's `maxmemory-policy`. Keys of clearable caches are
+    scoped to the current generation of the cache, so clearing one is a
+    single write rather than a scan of the whole keyspace, at the cost of
+    looking the generation up along with every key, see `clear`.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        ttl: float,
+        prefix: str,
+        clearable: bool = False,
+    ):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.clearable = clearable
+        self.generation_key = f"{prefix}:generation"
+
+    async def make_key(self, key: str) -> str:
+        if not self.clearable:
+            return f"{self.prefix}:{key}"
+
+        generation = await self.client.get(self.generation_key)
+        if isinstance(generation, bytes):
+            generation = generation.decode()
+
+        return f"{self.prefix}:{generation}:{key}"
+
+    async def get(self, key: str) -> bytes | None:
+        """Returns the value stored for the key, if it hasn't expired."""
+        return await self.client.get(await self.make_key(key))
+
+    async def set(
+        self, key: str, value: str | bytes, ttl: float | None = None
+    ):
+        """Stores the value for the given time to live."""
+        await self.client.set(
+            await self.make_key(key),
+            value,
+            px=int((ttl or self.ttl) * 1000),
+        )
+
+    async def delete(self, *keys: str):
+        """Removes the keys from the cache."""
+        if keys:
+            key_prefix = await self.make_key("")
+            await self.client.delete(*(key_prefix + key for key in keys))
+
+    async def clear(self):
+        """
+        Drops every entry of the cache by starting a new generation.
+
+        Entries of the previous generations are left to their time to live.
+        The generation never expires, so they can't be read again. Only
+        caches created as `clearable` can be cleared.
+        """
+        if not self.clearable:
+            raise TypeError(f"the {self.prefix} cache can't be cleared")
+
+        await self.client.set(self.generation_key, uuid4().hex)
+
+
+@cache
+def get_redis_client() -> redis.Redis:
+    return redis.from_url(settings.cache_url)
+
+
+def create_cache(
+    prefix: str, ttl: float, max_size: int, clearable: bool = False
+) -> MemoryCache | RedisCache:
+    """
+    Returns the cache backend configured in the settings.
+
+    Setting `cache_url` shares the cache between workers through Redis,
+    otherwise every worker keeps its own cache in memory. Caches that are
+    dropped all at once must be `clearable`.
+    """
+    if settings.cache_url:
+        return RedisCache(
+            get_redis_client(), ttl=ttl, prefix=prefix, clearable=clearable
+        )
+
+    return MemoryCache(ttl=ttl, max_size=max_size)
+
+
+user_cache = create_cache(
+    prefix="user",
+    ttl=settings.user_cache_ttl,
+    max_size=settings.user_cache_size,
+)
+
+# serialized responses of the posts endpoints. Entries in other workers'
+# memory caches are only dropped by their time to live, use a shared cache to
+# have writes invalidate them everywhere.
+post_cache = create_cache(
+    prefix="post",
+    ttl=settings.post_cache_ttl,
+    max_size=settings.post_cache_size,
+    clearable=True,
+)
+post_list_cache = create_cache(
+    prefix="posts",
+    ttl=settings.post_cache_ttl,
+    max_size=settings.post_cache_size,
+    clearable=True,
+)
+# counts of filtered listings only go stale by their time to live, they are
+# reported as estimates
+post_count_cache = create_cache(
+    prefix="post_count",
+    ttl=settings.post_count_cache_ttl,
+    max_size=settings.post_cache_size,
+    clearable=True,
+)
+
+
+async def invalidate_posts(*post_ids: UUID):
+    """Drops the cached posts and every cached listing of posts."""
+    await post_cache.delete(*map(str, post_ids))
+    await post_list_cache.clear()
+
+
+async def invalidate_all_posts():
+    """Drops every cached post and listing of posts."""
+    await post_cache.clear()
+    await post_count_cache.clear()
+    await invalidate_posts()
+
+
+def invalidate_on_commit(
+    db: AsyncSession, invalidation: Callable[..., Awaitable], *args: Any
+):
+    """
+    Schedules a cache invalidation for once the session is committed.
+
+    Invalidating before the commit would let a concurrent request read the
+    data still committed and cache it again, for its whole time to live.
+    Invalidations are dropped along with the session if it isn't committed.
+    """
+    db.info.setdefault("invalidations", []).append((invalidation, args))
+
+
+async def run_invalidations(db: AsyncSession):
+    """Runs the invalidations scheduled on a committed session."""
+    for invalidation, args in db.info.pop("invalidations", []):
+        await invalidation(*args)
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Literal
 
 from pydantic_settings import BaseSettings
 
@@ -11,10 +12,32 @@ class Settings(BaseSettings):
     db_password: str
     db_name: str
     db_port: int
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = -1
+    db_pool_pre_ping: bool = False
+    db_statement_timeout: int = 0
     secret_key: str
     oauth2_algorithm: str
     access_token_expire_minutes: int
     access_token_duration: datetime | None = None
+    cache_url: str | None = None
+    user_cache_ttl: float = 60
+    user_cache_size: int = 10000
+    token_cache_size: int = 10000
+    post_cache_ttl: float = 30
+    post_cache_size: int = 1000
+    post_count_cache_ttl: float = 300
+    post_user_loading: Literal["joined", "selectin"] = "joined"
+    post_export_batch_size: int = 1000
+    trending_refresh_interval: float = 60
+    timeline_fanout_max_followers: int = 10000
+    timeline_fanout_max_entries: int = 100_000
+    timeline_backfill_size: int = 100
+    password_hash_rounds: int = 12
+    password_hash_workers: int = 4
+    password_hash_queue_size: int = 32
     dev: bool = False
     production_server: str | None = ""
 
@@ -1,13 +1,51 @@
-from typing import Generic, TypeVar
+from datetime import datetime
+from typing import Any, AsyncIterator, Generic, Sequence, TypeVar
+from urllib.parse import urlencode
 from uuid import UUID
 
 from fastapi import HTTPException, status
-from pydantic import BaseModel
-from sqlalchemy import func, or_
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from sqlalchemy import (
+    Select,
+    Uuid,
+    cast,
+    column,
+    delete,
+    func,
+    literal,
+    not_,
+    or_,
+    select,
+    table,
+    text,
+    true,
+    tuple_,
+    union,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects.postgresql import REGCLASS, insert
 from sqlalchemy.engine.row import Row
-from sqlalchemy.orm import Query, Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.strategy_options import _AbstractLoad
 
 from posts_app import models, schemas
+from posts_app.cache import (
+    invalidate_all_posts,
+    invalidate_on_commit,
+    invalidate_posts,
+    post_count_cache,
+    user_cache,
+)
+from posts_app.config import settings
+from posts_app.utils import decode_cursor, encode_cursor
+
+# SQLSTATE of foreign key violations
+FOREIGN_KEY_VIOLATION = "23503"
+# key of the advisory lock held while refreshing the trending posts
+TRENDING_REFRESH_LOCK = 7_316_450_821
 
 ModelType = TypeVar("ModelType")
 SchemaType = TypeVar("SchemaType", bound=BaseModel)
@@ -32,10 +70,42 @@ class APICrudBase(Generic[ModelType, SchemaType]):
         detail_error = detail_error.replace('"', "'")
         return detail_error
 
-    def get_by_id(self, *, db: Session, obj_id: str) -> ModelType:
+    def get_filters(self, query_fields: dict[str, Any]) -> dict[str, Any]:
+        """
+        Converts raw query parameters into values of the model's columns.
+
+        The async driver doesn't let the database cast strings for us, so
+        every value is validated against the python type of its column.
+        """
+        filters = {}
+        for field, value in query_fields.items():
+            column = self.model.__table__.columns.get(field)
+            try:
+                if column is None:
+                    raise ValueError(f"unknown field {field}")
+                python_type = column.type.python_type
+                filters[field] = TypeAdapter(python_type).validate_python(
+                    value
+                )
+            except (
+                NotImplementedError,
+                ValidationError,
+                ValueError,
+            ) as error:
+                raise HTTPException(
+                    detail={
+                        "message": f"Error fetching {self.model_name} objects",
+                        "reason": f"invalid value passed as {field}",
+                    },
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                ) from error
+
+        return filters
+
+    async def get_by_id(self, *, db: AsyncSession, obj_id: str) -> ModelType:
         """Returns a single object by its id."""
         try:
-            UUID(obj_id)
+            obj_id = UUID(obj_id)
         except (ValueError, AttributeError) as error:
             print(error)
             raise HTTPException(
@@ -43,7 +113,7 @@ class APICrudBase(Generic[ModelType, SchemaType]):
                 status_code=status.HTTP_400_BAD_REQUEST,
             ) from error
         else:
-            obj = db.query(self.model).filter(self.model.id == obj_id).first()
+            obj = await db.get(self.model, obj_id)
 
         if obj:
             return obj
@@ -53,20 +123,25 @@ class APICrudBase(Generic[ModelType, SchemaType]):
             status_code=status.HTTP_404_NOT_FOUND,
         )
 
-    def get_all(self, *, db: Session, **query_fields) -> Query:
+    async def get_all(
+        self, *, db: AsyncSession, **query_fields
+    ) -> Sequence[ModelType]:
         """Return all objects of the model."""
         skip = query_fields.pop("skip", 0)
         limit = query_fields.pop("limit", 25)
         order_by = query_fields.pop("order_by", None)
 
         try:
-            return (
-                db.query(self.model)
+            statement = (
+                select(self.model)
                 .order_by(order_by)
-                .filter_by(**query_fields)
-                .offset(skip)
-                .limit(limit)
+                .filter_by(**self.get_filters(query_fields))
+                .offset(int(skip))
+                .limit(int(limit))
             )
+            return (await db.scalars(statement)).all()
+        except HTTPException:
+            raise
         except Exception as error:
             raise HTTPException(
                 detail={
@@ -76,18 +151,20 @@ class APICrudBase(Generic[ModelType, SchemaType]):
                 status_code=status.HTTP_400_BAD_REQUEST,
             ) from error
 
-    def create(
+    async def create(
         self,
-        db: Session,
+        db: AsyncSession,
         schema: SchemaType,
         obj_owner_id: str | None = None,
     ):
         try:
             if obj_owner_id:
-                return self.model().save(
+                return await self.model().save(
                     user_id=obj_owner_id, **schema.model_dump(), db=db
                 )
-            return self.model().save(**schema.model_dump(), db=db)
+            return await self.model().save(**schema.model_dump(), db=db)
+        except HTTPException:
+            raise
         except Exception as error:
             print(error)
             raise HTTPException(
@@ -98,15 +175,15 @@ class APICrudBase(Generic[ModelType, SchemaType]):
                 status_code=status.HTTP_400_BAD_REQUEST,
             ) from error
 
-    def update(
+    async def update(
         self,
         *,
-        db: Session,
+        db: AsyncSession,
         schema: SchemaType,
         obj_id: str,
         obj_owner_id: str,
     ):
-        obj = self.get_by_id(db=db, obj_id=obj_id)
+        obj = await self.get_by_id(db=db, obj_id=obj_id)
         if obj_owner_id != obj.id:
             raise HTTPException(
                 detail="You are not authorized to update this "
@@ -114,7 +191,9 @@ class APICrudBase(Generic[ModelType, SchemaType]):
                 status_code=status.HTTP_403_FORBIDDEN,
             )
         try:
-            return obj.save(**schema.model_dump(), db=db)
+            return await obj.save(**schema.model_dump(), db=db)
+        except HTTPException:
+            raise
         except Exception as error:
             raise HTTPException(
                 detail={
@@ -124,30 +203,30 @@ class APICrudBase(Generic[ModelType, SchemaType]):
                 status_code=status.HTTP_400_BAD_REQUEST,
             ) from error
 
-    def delete(
+    async def delete(
         self,
-        db: Session,
+        db: AsyncSession,
         obj_id: str,
         obj_owner_id: str,
     ):
-        obj = self.get_by_id(db=db, obj_id=obj_id)
+        obj = await self.get_by_id(db=db, obj_id=obj_id)
         if obj_owner_id != obj.id:
             raise HTTPException(
                 detail="You are not authorized to delete this "
                 f"{self.model_name}",
                 status_code=status.HTTP_403_FORBIDDEN,
             )
-        obj.delete(db=db)
+        await obj.delete(db=db)
 
-    def partial_update(
+    async def partial_update(
         self,
         *,
-        db: Session,
+        db: AsyncSession,
         schema: SchemaType,
         obj_id: str,
         obj_owner_id: str,
     ):
-        stored_obj = self.get_by_id(obj_id=obj_id, db=db)
+        stored_obj = await self.get_by_id(obj_id=obj_id, db=db)
         if obj_owner_id != stored_obj.id:
             raise HTTPException(
                 detail=f"You are not authorized to update this "
@@ -155,7 +234,7 @@ class APICrudBase(Generic[ModelType, SchemaType]):
                 status_code=status.HTTP_403_FORBIDDEN,
             )
         update_data = schema.model_dump(exclude_unset=True)
-        return stored_obj.save(**update_data, db=db)
+        return await stored_obj.save(**update_data, db=db)
 
 
 class PostCrud(APICrudBase[models.Post, schemas.Post]):
@@ -164,85 +243,604 @@ class PostCrud(APICrudBase[models.Post, schemas.Post]):
     def __init__(self, model: models.Post = models.Post):
         super().__init__(model)
 
-    def update(
+    async def create(
+        self,
+        db: AsyncSession,
+        schema: schemas.PostCreateUpdate,
+        obj_owner_id: str | None = None,
+    ):
+        """Create a post and write it to its author's followers' timelines."""
+        post = await super().create(
+            db=db, schema=schema, obj_owner_id=obj_owner_id
+        )
+        await self.fan_out(db=db, post_ids=[post.id], author_id=post.user_id)
+        invalidate_on_commit(db, invalidate_posts)
+        return post
+
+    async def update(
         self,
         *,
-        db: Session,
+        db: AsyncSession,
         schema: schemas.PostCreateUpdate,
         post_id: str,
         user_id: str,
     ):
         """Update a post."""
-        post = self.get_by_id(db=db, post_id=post_id)[0]
+        post = (await self.get_by_id(db=db, post_id=post_id))[0]
         if user_id != post.user_id:
             raise HTTPException(
                 detail="You are not authorized to update this post",
                 status_code=status.HTTP_403_FORBIDDEN,
             )
-        return post.save(**schema.model_dump(), db=db)
+        post = await post.save(**schema.model_dump(), db=db)
+        invalidate_on_commit(db, invalidate_posts, post.id)
+        return post
 
-    def delete(
+    async def delete(
         self,
-        db: Session,
+        db: AsyncSession,
         post_id: str,
         user_id: str,
     ):
         """Delete a post."""
-        post = self.get_by_id(db=db, post_id=post_id)[0]
+        post = (await self.get_by_id(db=db, post_id=post_id))[0]
         if user_id != post.user_id:
             raise HTTPException(
                 detail="You are not authorized to delete this post",
                 status_code=status.HTTP_403_FORBIDDEN,
             )
-        post.delete(db=db)
+        await post.delete(db=db)
+        invalidate_on_commit(db, invalidate_posts, post.id)
 
-    def partial_update(
+    async def partial_update(
         self,
         *,
-        db: Session,
+        db: AsyncSession,
         schema: schemas.PostPartialUpdate,
         post_id: str,
         user_id: str,
     ):
         """Partially update a post."""
-        stored_post = self.get_by_id(post_id=post_id, db=db)[0]
+        stored_post = (await self.get_by_id(post_id=post_id, db=db))[0]
         if user_id != stored_post.user_id:
             raise HTTPException(
                 detail="You are not authorized to update this post",
                 status_code=status.HTTP_403_FORBIDDEN,
             )
         update_data = schema.model_dump(exclude_unset=True)
-        return stored_post.save(**update_data, db=db)
+        stored_post = await stored_post.save(**update_data, db=db)
+        invalidate_on_commit(db, invalidate_posts, stored_post.id)
+        return stored_post
 
-    def get_all(self, *, db: Session, **query_fields) -> Query:
+    async def create_many(
+        self,
+        *,
+        db: AsyncSession,
+        posts: list[schemas.PostCreateUpdate],
+        obj_owner_id: UUID,
+    ) -> Sequence[Row]:
         """
-        Get all posts.
+        Create many posts in a single statement.
 
-        This can be further filtered by passing query parameters.
+        The posts are returned as rows of their columns, in the order given.
+        """
+        statement = insert(self.model).returning(
+            self.model.id,
+            self.model.title,
+            self.model.content,
+            self.model.published,
+            self.model.created_at,
+            self.model.updated_at,
+            sort_by_parameter_order=True,
+        )
+        try:
+            created = (
+                await db.execute(
+                    statement,
+                    [
+                        {**post.model_dump(), "user_id": obj_owner_id}
+                        for post in posts
+                    ],
+                )
+            ).all()
+        except Exception as error:
+            raise HTTPException(
+                detail={
+                    "message": "Error creating posts",
+                    "reason": self.get_detailed_error(error),
+                },
+                status_code=status.HTTP_400_BAD_REQUEST,
+            ) from error
+
+        await self.fan_out(
+            db=db,
+            post_ids=[post.id for post in created],
+            author_id=obj_owner_id,
+        )
+        invalidate_on_commit(db, invalidate_posts)
+        return created
+
+    @staticmethod
+    def get_pulled_author_filter():
+        """
+        Returns the filter on users whose posts are merged into timelines
+        as they are read rather than fanned out on write.
+        """
+        return or_(
+            models.User.follower_count
+            > settings.timeline_fanout_max_followers,
+            models.User.fan_out_on_read,
+        )
+
+    async def fan_out(
+        self, *, db: AsyncSession, post_ids: list[UUID], author_id: UUID
+    ):
+        """
+        Writes new posts to the home timelines of their author's followers.
+
+        Authors with more than `TIMELINE_FANOUT_MAX_FOLLOWERS` followers, or
+        whose posts would write more than `TIMELINE_FANOUT_MAX_ENTRIES`
+        entries at once, are merged into timelines as they are read instead,
+        see `get_timeline`. They stay merged on read from then on, so the
+        posts left out aren't lost if their followers drop back.
+        """
+        author = (
+            await db.execute(
+                select(
+                    models.User.follower_count, models.User.fan_out_on_read
+                ).filter(models.User.id == author_id)
+            )
+        ).one()
+        if author.fan_out_on_read or not author.follower_count:
+            return
+        if (
+            author.follower_count > settings.timeline_fanout_max_followers
+            or author.follower_count * len(post_ids)
+            > settings.timeline_fanout_max_entries
+        ):
+            await db.execute(
+                update(models.User)
+                .filter(models.User.id == author_id)
+                .values(fan_out_on_read=True)
+            )
+            invalidate_on_commit(db, user_cache.delete, str(author_id))
+            return
+
+        follow, entry = models.Follow, models.TimelineEntry
+        posts = (
+            select(
+                follow.follower_id,
+                self.model.id,
+                self.model.user_id,
+                self.model.created_at,
+            )
+            .select_from(self.model)
+            .join(follow, follow.followed_id == self.model.user_id)
+            .filter(self.model.id.in_(post_ids))
+        )
+        await db.execute(
+            insert(entry)
+            .from_select(
+                ["user_id", "post_id", "author_id", "created_at"], posts
+            )
+            .on_conflict_do_nothing()
+        )
+
+    async def delete_many(
+        self, *, db: AsyncSession, post_ids: list[UUID], user_id: UUID
+    ) -> list[UUID]:
+        """
+        Delete many posts of a user in a single statement.
+
+        Posts that don't exist or belong to someone else are left alone, the
+        ids of the deleted posts are returned.
+        """
+        statement = (
+            delete(self.model)
+            .filter(
+                self.model.id.in_(post_ids), self.model.user_id == user_id
+            )
+            .returning(self.model.id)
+        )
+        try:
+            deleted = list((await db.scalars(statement)).all())
+        except Exception as error:
+            raise HTTPException(
+                detail={
+                    "message": "Error deleting posts",
+                    "reason": self.get_detailed_error(error),
+                },
+                status_code=status.HTTP_400_BAD_REQUEST,
+            ) from error
+
+        if deleted:
+            invalidate_on_commit(db, invalidate_posts, *deleted)
+        return deleted
+
+    def get_search_filter(self, search: str, search_mode: str):
+        """
+        Returns the filter for searching posts in the given search mode.
+
+        - **fulltext**: web search syntax matched against the posts' full
+          text index.
+        - **phrase**: the words must appear next to each other, also
+          matched against the full text index.
+        - **contains**: plain substring match on the title and content,
+          this can't use an index and should be avoided on large tables.
+        """
+        if search_mode == "contains":
+            return or_(
+                self.model.title.icontains(search),
+                self.model.content.icontains(search),
+            )
+        return self.model.search_vector.bool_op("@@")(
+            self.get_search_query(search, search_mode)
+        )
+
+    @staticmethod
+    def get_search_query(search: str, search_mode: str):
+        """Returns the text search query for the given search mode."""
+        if search_mode == "fulltext":
+            return func.websearch_to_tsquery("english", search)
+        if search_mode == "phrase":
+            return func.phraseto_tsquery("english", search)
+
+        raise HTTPException(
+            detail="invalid search mode",
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+
+    @staticmethod
+    def get_user_loader(user_loading: str | None = None) -> _AbstractLoad:
+        """
+        Returns the loader option for the owners of posts.
+
+        Owners are joined into the query of the posts or, with `selectin`,
+        fetched by a second query for all the owners of the posts at once.
+        The strategy defaults to the `POST_USER_LOADING` setting.
+        """
+        loaders = {"joined": joinedload, "selectin": selectinload}
+
+        return loaders[user_loading or settings.post_user_loading](
+            models.Post.user
+        )
+
+    def get_row_columns(self) -> tuple:
+        """
+        Returns the columns read-only listings of posts are built from.
+
+        Selecting them skips hydrating ORM instances and the identity map,
+        the owner is joined in the same statement.
+        """
+        return (
+            self.model.id,
+            self.model.title,
+            self.model.content,
+            self.model.published,
+            self.model.created_at,
+            self.model.updated_at,
+            models.User.id.label("user_id"),
+            models.User.email.label("user_email"),
+            self.model.vote_count.label("votes"),
+        )
+
+    def get_query(
+        self,
+        *,
+        rows: bool = False,
+        user_loading: str | None = None,
+        **query_fields,
+    ) -> Select:
+        """
+        Returns the unpaginated query for posts along with their votes.
+
+        Posts are selected as plain rows of the columns listings need when
+        `rows` is true, otherwise their owners are loaded with the
+        `user_loading` strategy. This can be further filtered by passing
+        query parameters.
         """
-        skip = query_fields.pop("skip", 0)
-        limit = query_fields.pop("limit", 25)
-        order_by = query_fields.pop("order_by", None)
         search = query_fields.pop("search", "")
+        search_mode = query_fields.pop("search_mode", "fulltext")
+
+        if rows:
+            # filter before joining, filter_by applies to the joined entity
+            query = (
+                select(*self.get_row_columns())
+                .filter_by(**self.get_filters(query_fields))
+                .join(self.model.user)
+            )
+        else:
+            query = (
+                select(self.model, self.model.vote_count.label("votes"))
+                .filter_by(**self.get_filters(query_fields))
+                .options(self.get_user_loader(user_loading))
+            )
+
+        if search:
+            query = query.filter(self.get_search_filter(search, search_mode))
+
+        return query
+
+    def get_count_query(self, **query_fields) -> Select:
+        """Returns the query counting the posts matching the parameters."""
+        return self.get_query(**query_fields).with_only_columns(
+            func.count(), maintain_column_froms=True
+        )
+
+    def get_export_query(self, **query_fields) -> Select:
+        """
+        Returns the unpaginated query for exporting posts, oldest first.
+
+        Posts are selected as plain rows, see `get_row_columns`.
+        """
+        return self.get_query(rows=True, **query_fields).order_by(
+            self.model.created_at, self.model.id
+        )
 
+    @staticmethod
+    async def stream(
+        *, db: AsyncSession, query: Select, batch_size: int
+    ) -> AsyncIterator[Sequence[Row]]:
+        """
+        Yields the rows of a query in batches of `batch_size`.
+
+        Rows are read through a server-side cursor, so only one batch is
+        held in memory at a time.
+        """
+        result = await db.stream(
+            query.execution_options(yield_per=batch_size)
+        )
+        async for rows in result.partitions():
+            yield rows
+
+    def get_offset_query(
+        self, *, rows: bool = False, **query_fields
+    ) -> Select:
+        """
+        Returns the query for a page of posts paginated by offset.
+
+        Full text searches are ranked by relevance unless `order_by` is given.
+        """
+        skip = int(query_fields.pop("skip", 0))
+        limit = int(query_fields.pop("limit", 25))
+        order_by = query_fields.pop("order_by", None)
+        search = query_fields.get("search", "")
+        search_mode = query_fields.get("search_mode", "fulltext")
+
+        if order_by is None and search and search_mode != "contains":
+            order_by = func.ts_rank(
+                self.model.search_vector,
+                self.get_search_query(search, search_mode),
+            ).desc()
+
+        return (
+            self.get_query(rows=rows, **query_fields)
+            .order_by(order_by)
+            .offset(skip)
+            .limit(limit)
+        )
+
+    async def get_all(
+        self, *, db: AsyncSession, rows: bool = False, **query_fields
+    ) -> Sequence[Row]:
+        """
+        Get all posts.
+
+        Plain rows are returned instead of posts when `rows` is true, see
+        `get_row_columns`, otherwise the owners of the posts are loaded with
+        the `user_loading` strategy. This can be further filtered by passing
+        query parameters.
+        """
         try:
-            results = (
-                db.query(
-                    self.model, func.count(models.Vote.post_id).label("votes")
+            statement = self.get_offset_query(rows=rows, **query_fields)
+            results = (await db.execute(statement)).all()
+        except HTTPException:
+            raise
+        except Exception as error:
+            raise HTTPException(
+                detail={
+                    "message": "Error fetching posts",
+                    "reason": str(error).replace('"', "'"),
+                },
+                status_code=status.HTTP_400_BAD_REQUEST,
+            ) from error
+        else:
+            return results
+
+    async def get_estimated_count(
+        self, *, db: AsyncSession, **query_fields
+    ) -> int:
+        """
+        Returns an estimate of the number of posts matching the parameters.
+
+        Unfiltered listings use the planner's estimate of the size of the
+        posts table, filtered ones a count cached for a short while.
+        """
+        if not query_fields:
+            estimate = await db.scalar(
+                select(column("reltuples"))
+                .select_from(table("pg_class"))
+                .where(
+                    column("oid")
+                    == cast(literal(self.model.__tablename__), REGCLASS)
                 )
-                .filter(
-                    or_(
-                        self.model.title.icontains(search),
-                        self.model.content.icontains(search),
+            )
+            # tables that were never analyzed have no estimate yet
+            if estimate is not None and estimate >= 0:
+                return int(estimate)
+
+        cache_key = urlencode(sorted(query_fields.items()))
+        count = await post_count_cache.get(cache_key)
+        if count is None:
+            count = await db.scalar(self.get_count_query(**query_fields))
+            await post_count_cache.set(cache_key, str(count))
+
+        return int(count)
+
+    @staticmethod
+    def get_skip_limit(query_fields: dict[str, Any]) -> tuple[int, int]:
+        """Pops and validates the `skip` and `limit` query parameters."""
+        try:
+            skip = int(query_fields.pop("skip", 0))
+            limit = int(query_fields.pop("limit", 25))
+            if skip < 0 or limit < 1:
+                raise ValueError("skip and limit must be positive")
+        except ValueError as error:
+            raise HTTPException(
+                detail="invalid skip or limit",
+                status_code=status.HTTP_400_BAD_REQUEST,
+            ) from error
+
+        return skip, limit
+
+    async def get_keyset_page(
+        self,
+        *,
+        db: AsyncSession,
+        query: Select,
+        keyset: tuple[Any, Any],
+        cursor: str | None,
+        limit: int,
+        key_type: type = datetime,
+    ) -> tuple[list[Row], int, dict | None, dict | None]:
+        """
+        Runs the query for a page of rows paginated on a keyset, highest
+        keys first, and returns the rows along with the number of the page
+        and the links to the pages next to it.
+
+        The keyset is a pair of columns the query selects, a key of
+        `key_type` and an id. Pages are linked to by cursors holding the
+        keyset position of their first or last row, so every page costs the
+        same no matter how deep it is.
+        """
+        key_column, id_column = keyset
+        position = tuple_(key_column, id_column)
+        current_page, direction = 1, "next"
+
+        if cursor:
+            key, obj_id, current_page, direction = decode_cursor(
+                cursor, key_type
+            )
+            if direction == "next":
+                query = query.filter(position < (key, obj_id))
+            else:
+                query = query.filter(position > (key, obj_id))
+
+        if direction == "next":
+            query = query.order_by(key_column.desc(), id_column.desc())
+        else:
+            query = query.order_by(key_column, id_column)
+
+        # fetch one extra row to find out whether there's a page after
+        results = (await db.execute(query.limit(limit + 1))).all()
+        has_more = len(results) > limit
+        results = results[:limit]
+        if direction == "previous":
+            results.reverse()
+
+        next_page = previous_page = None
+        if results:
+            first_row, last_row = results[0], results[-1]
+            if has_more or direction == "previous":
+                next_page = {
+                    "cursor": encode_cursor(
+                        getattr(last_row, key_column.key),
+                        getattr(last_row, id_column.key),
+                        current_page + 1,
                     )
-                )
-                .filter_by(**query_fields)
-                .outerjoin(models.Vote, models.Vote.post_id == self.model.id)
-                .group_by(self.model.id)
-                .order_by(order_by)
-                .offset(skip)
-                .limit(limit)
+                }
+            if cursor and (has_more or direction == "next"):
+                previous_page = {
+                    "cursor": encode_cursor(
+                        getattr(first_row, key_column.key),
+                        getattr(first_row, id_column.key),
+                        max(current_page - 1, 1),
+                        "previous",
+                    )
+                }
+
+        return results, current_page, next_page, previous_page
+
+    async def get_page(
+        self, *, db: AsyncSession, **query_fields
+    ) -> tuple[list[Row], dict[str, Any]]:
+        """
+        Get a page of posts along with its pagination metadata.
+
+        Posts are returned as plain rows, see `get_row_columns`.
+
+        Posts are returned newest first and paginated on the
+        `(created_at, id)` keyset, so every page costs the same no matter
+        how deep it is. Passing `skip` or `order_by`, or running a ranked
+        full text search, falls back to offset pagination.
+
+        With `count_mode=exact` the matching posts are counted in the same
+        statement that fetches the page. The default, `estimated`, uses the
+        planner's estimate for unfiltered listings and a cached count for
+        filtered ones, so large listings aren't counted on every request.
+        """
+        cursor = query_fields.pop("cursor", None)
+        count_mode = query_fields.pop("count_mode", "estimated")
+        order_by = query_fields.pop("order_by", None)
+        # an empty search doesn't filter the listing, nor make it counted
+        if not query_fields.get("search"):
+            query_fields.pop("search", None)
+            query_fields.pop("search_mode", None)
+        ranked = query_fields.get("search") and (
+            query_fields.get("search_mode", "fulltext") != "contains"
+        )
+        paginate_by_offset = (
+            "skip" in query_fields or order_by is not None or ranked
+        )
+
+        if count_mode not in ("exact", "estimated"):
+            raise HTTPException(
+                detail="invalid count mode",
+                status_code=status.HTTP_400_BAD_REQUEST,
+            )
+        skip, limit = self.get_skip_limit(query_fields)
+
+        if paginate_by_offset:
+            # fetch one extra row to find out whether there's a page after
+            query = self.get_offset_query(
+                rows=True,
+                skip=skip,
+                limit=limit + 1,
+                order_by=order_by,
+                **query_fields,
+            )
+        else:
+            query = self.get_query(rows=True, **query_fields)
+
+        if count_mode == "exact":
+            # an uncorrelated subquery is run once for the whole statement
+            query = query.add_columns(
+                self.get_count_query(**query_fields)
+                .scalar_subquery()
+                .label("total_count")
             )
+
+        next_page = previous_page = None
+        try:
+            if paginate_by_offset:
+                results = (await db.execute(query)).all()
+                if len(results) > limit:
+                    next_page = {"skip": skip + limit}
+                if skip:
+                    previous_page = {"skip": max(skip - limit, 0)}
+                results = results[:limit]
+                current_page = skip // limit + 1
+            else:
+                page = await self.get_keyset_page(
+                    db=db,
+                    query=query,
+                    keyset=(self.model.created_at, self.model.id),
+                    cursor=cursor,
+                    limit=limit,
+                )
+                results, current_page, next_page, previous_page = page
+        except HTTPException:
+            raise
         except Exception as error:
             raise HTTPException(
                 detail={
@@ -251,30 +849,239 @@ class PostCrud(APICrudBase[models.Post, schemas.Post]):
                 },
                 status_code=status.HTTP_400_BAD_REQUEST,
             ) from error
+
+        if count_mode == "estimated":
+            total_count = await self.get_estimated_count(
+                db=db, **query_fields
+            )
+        elif results:
+            total_count = results[0].total_count
         else:
-            return results
+            total_count = await db.scalar(
+                self.get_count_query(**query_fields)
+            )
+
+        pagination = {
+            "next": next_page,
+            "previous": previous_page,
+            "total_count": total_count,
+            "total_count_estimated": count_mode == "estimated",
+            # an estimate may not account for the pages already seen
+            "total_pages": max(
+                -(-total_count // limit), current_page + bool(next_page)
+            ),
+            "current_page": current_page,
+        }
+
+        return results, pagination
+
+    async def get_trending(
+        self, *, db: AsyncSession, **query_fields
+    ) -> tuple[list[Row], dict[str, Any]]:
+        """
+        Get a page of trending posts along with its pagination metadata.
+
+        Posts are returned as plain rows, see `get_row_columns`, highest
+        scored first in the `trending_posts` view, and paginated on the
+        `(score, post_id)` keyset, see `get_keyset_page`. Scores are only
+        updated when the view is refreshed, see `refresh_trending`, and the
+        number of trending posts is cached for a short while.
+        """
+        cursor = query_fields.pop("cursor", None)
+        _, limit = self.get_skip_limit(query_fields)
+        trending = models.trending_posts
 
-    def get_by_id(
-        self, *, db: Session, post_id: str
+        query = (
+            select(
+                *self.get_row_columns(), trending.c.score, trending.c.post_id
+            )
+            .select_from(trending)
+            .join(self.model, self.model.id == trending.c.post_id)
+            .join(self.model.user)
+        )
+        page = await self.get_keyset_page(
+            db=db,
+            query=query,
+            keyset=(trending.c.score, trending.c.post_id),
+            cursor=cursor,
+            limit=limit,
+            key_type=float,
+        )
+        results, current_page, next_page, previous_page = page
+
+        total_count = await post_count_cache.get("trending")
+        if total_count is None:
+            total_count = await db.scalar(
+                select(func.count()).select_from(trending)
+            )
+            await post_count_cache.set("trending", str(total_count))
+        total_count = int(total_count)
+
+        pagination = {
+            "next": next_page,
+            "previous": previous_page,
+            "total_count": total_count,
+            "total_count_estimated": True,
+            "total_pages": max(
+                -(-total_count // limit), current_page + bool(next_page)
+            ),
+            "current_page": current_page,
+        }
+
+        return results, pagination
+
+    async def get_timeline(
+        self, *, db: AsyncSession, user_id: UUID, **query_fields
+    ) -> tuple[list[Row], dict[str, Any]]:
+        """
+        Get a page of a user's home timeline, newest first.
+
+        Posts are returned as plain rows, see `get_row_columns`, and
+        paginated on the `(created_at, id)` keyset.
+
+        Timelines merge the entries written to them by `fan_out` with the
+        latest posts of the user and of the followed authors with too many
+        followers to be fanned out to. Each of those authors' posts is a
+        range of the posts' `(user_id, created_at, id)` index, and no more
+        than a page is read from every source.
+        """
+        cursor = query_fields.pop("cursor", None)
+        _, limit = self.get_skip_limit(query_fields)
+        follow, entry = models.Follow, models.TimelineEntry
+        current_page = 1
+
+        pushed = (
+            select(entry.created_at, entry.post_id.label("id"))
+            .filter(entry.user_id == user_id)
+            .order_by(entry.created_at.desc(), entry.post_id.desc())
+        )
+        # the user's own posts are never fanned out
+        authors = union_all(
+            select(literal(user_id, Uuid).label("author_id")),
+            select(follow.followed_id)
+            .join(models.User, models.User.id == follow.followed_id)
+            .filter(
+                follow.follower_id == user_id,
+                self.get_pulled_author_filter(),
+            ),
+        ).subquery("authors")
+        author_posts = (
+            select(self.model.created_at, self.model.id)
+            .filter(self.model.user_id == authors.c.author_id)
+            .order_by(self.model.created_at.desc(), self.model.id.desc())
+        )
+
+        if cursor:
+            created_at, post_id, current_page, direction = decode_cursor(
+                cursor
+            )
+            # only pages after the current one are linked to
+            if direction != "next":
+                raise HTTPException(
+                    detail="invalid cursor",
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                )
+            pushed = pushed.filter(
+                tuple_(entry.created_at, entry.post_id)
+                < (created_at, post_id)
+            )
+            author_posts = author_posts.filter(
+                tuple_(self.model.created_at, self.model.id)
+                < (created_at, post_id)
+            )
+
+        # fetch one extra row to find out whether there's a page after
+        pushed = pushed.limit(limit + 1).subquery("pushed")
+        author_posts = author_posts.limit(limit + 1).lateral("author_posts")
+        # posts fanned out before their author had too many followers are
+        # found in both, the union keeps them once
+        merged = union(
+            select(pushed.c.created_at, pushed.c.id),
+            select(author_posts.c.created_at, author_posts.c.id)
+            .select_from(authors)
+            .join(author_posts, true()),
+        )
+        # only the posts of the page are joined to their columns
+        timeline = (
+            merged.order_by(
+                merged.selected_columns.created_at.desc(),
+                merged.selected_columns.id.desc(),
+            )
+            .limit(limit + 1)
+            .subquery("timeline")
+        )
+
+        query = (
+            select(*self.get_row_columns())
+            .select_from(timeline)
+            .join(self.model, self.model.id == timeline.c.id)
+            .join(self.model.user)
+            .order_by(timeline.c.created_at.desc(), timeline.c.id.desc())
+        )
+        results = (await db.execute(query)).all()
+
+        has_more = len(results) > limit
+        results = results[:limit]
+
+        next_page = None
+        if has_more:
+            last_post = results[-1]
+            next_page = {
+                "cursor": encode_cursor(
+                    last_post.created_at, last_post.id, current_page + 1
+                )
+            }
+
+        return results, {"next": next_page}
+
+    @staticmethod
+    async def refresh_trending(*, db: AsyncSession) -> bool:
+        """
+        Recomputes the scores of the `trending_posts` view.
+
+        The view is refreshed concurrently, so the trending feed can still be
+        read meanwhile, and only the rows of posts that were voted on, or
+        that entered or left the week, are rewritten. Returns false without
+        refreshing it when another refresh is already running.
+        """
+        # the lock is released along with the transaction
+        locked = await db.scalar(
+            select(func.pg_try_advisory_xact_lock(TRENDING_REFRESH_LOCK))
+        )
+        if not locked:
+            return False
+
+        await db.execute(
+            text("REFRESH MATERIALIZED VIEW CONCURRENTLY trending_posts")
+        )
+        return True
+
+    async def get_by_id(
+        self,
+        *,
+        db: AsyncSession,
+        post_id: str,
+        user_loading: str | None = None,
     ) -> Row[tuple[models.Post, int]]:
-        """Returns a single post by its id."""
+        """
+        Returns a single post by its id.
+
+        The owner of the post is loaded with the `user_loading` strategy.
+        """
         try:
-            UUID(post_id)
+            post_id = UUID(post_id)
         except (ValueError, AttributeError) as error:
             raise HTTPException(
                 detail="invalid post id",
                 status_code=status.HTTP_400_BAD_REQUEST,
             ) from error
         else:
-            data: Row = (
-                db.query(
-                    self.model, func.count(models.Vote.post_id).label("votes")
-                )
-                .outerjoin(models.Vote, models.Vote.post_id == models.Post.id)
-                .group_by(models.Post.id)
-                .filter(models.Post.id == post_id)
-                .first()
+            statement = (
+                select(self.model, self.model.vote_count.label("votes"))
+                .filter(self.model.id == post_id)
+                .options(self.get_user_loader(user_loading))
             )
+            data: Row = (await db.execute(statement)).first()
 
         if not data:
             raise HTTPException(
@@ -288,50 +1095,289 @@ class VoteCrud(APICrudBase[models.Vote, schemas.Vote]):
     def __init__(self, model: models.Vote = models.Vote):
         super().__init__(model)
 
-    def create_or_delete(
-        self, db: Session, vote: schemas.Vote, user_id: str
+    async def create_or_delete(
+        self, db: AsyncSession, vote: schemas.Vote, user_id: str
     ) -> dict[str, str]:
-        """Adds or removes a vote from post."""
-        vote_found = (
-            db.query(models.Vote)
-            .filter(
-                models.Vote.post_id == vote.post_id,
-                models.Vote.user_id == user_id,
+        """
+        Adds or removes a vote from post.
+
+        Each is a single statement relying on the primary key of votes and
+        their foreign key to posts, so concurrent requests for the same vote
+        can't both succeed.
+        """
+        if vote.status:
+            statement = (
+                insert(self.model)
+                .values(user_id=user_id, post_id=vote.post_id)
+                .on_conflict_do_nothing()
+                .returning(self.model.post_id)
+            )
+        else:
+            statement = (
+                delete(self.model)
+                .filter(
+                    self.model.user_id == user_id,
+                    self.model.post_id == vote.post_id,
+                )
+                .returning(self.model.post_id)
             )
-            .first()
-        )
 
-        # ensure the post exists before moving forward
-        PostCrud().get_by_id(db=db, post_id=str(vote.post_id))
+        try:
+            changed = await db.scalar(statement)
+        except IntegrityError as error:
+            if getattr(error.orig, "pgcode", None) == FOREIGN_KEY_VIOLATION:
+                raise HTTPException(
+                    detail="Post not found",
+                    status_code=status.HTTP_404_NOT_FOUND,
+                ) from error
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={
+                    "message": "Error creating vote",
+                    "reason": self.get_detailed_error(error),
+                },
+            ) from error
 
-        if vote.status:
-            if vote_found:
+        if changed is None:
+            if vote.status:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="You have already voted on this post",
                 )
-            try:
-                self.create(db=db, schema=vote, obj_owner_id=user_id)
-            except Exception as error:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail={
-                        "message": "Error creating vote",
-                        "reason": self.get_detailed_error(error),
-                    },
-                ) from error
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Vote does not exist.",
+            )
+
+        invalidate_on_commit(db, invalidate_posts, vote.post_id)
+        if vote.status:
             return {"message": "Vote added successfully"}
+        return {"message": "Vote deleted successfully"}
+
+    async def create_or_delete_many(
+        self, db: AsyncSession, votes: list[schemas.Vote], user_id: UUID
+    ) -> list[dict[str, Any]]:
+        """
+        Adds and removes many votes from posts in a single transaction.
+
+        Votes are added by one `INSERT ... ON CONFLICT DO NOTHING` and
+        removed by one `DELETE`, instead of looking every vote and post up
+        first. The outcome of each vote is returned in the order given.
+        """
+        post_ids = [vote.post_id for vote in votes]
+        if len(set(post_ids)) != len(post_ids):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="A post can only be voted on once per batch",
+            )
+
+        to_add = [vote.post_id for vote in votes if vote.status]
+        to_delete = [vote.post_id for vote in votes if not vote.status]
+        added, deleted = set(), set()
+
+        try:
+            if to_add:
+                # votes for missing posts are skipped instead of failing
+                # the whole batch on the foreign key
+                statement = (
+                    insert(self.model)
+                    .from_select(
+                        ["user_id", "post_id"],
+                        select(literal(user_id, Uuid), models.Post.id).filter(
+                            models.Post.id.in_(to_add)
+                        ),
+                    )
+                    .on_conflict_do_nothing()
+                    .returning(self.model.post_id)
+                )
+                added = set((await db.scalars(statement)).all())
+            if to_delete:
+                statement = (
+                    delete(self.model)
+                    .filter(
+                        self.model.user_id == user_id,
+                        self.model.post_id.in_(to_delete),
+                    )
+                    .returning(self.model.post_id)
+                )
+                deleted = set((await db.scalars(statement)).all())
+
+            # only votes that changed nothing need telling apart
+            unchanged = set(post_ids) - added - deleted
+            existing_posts = set()
+            if unchanged:
+                existing_posts = set(
+                    (
+                        await db.scalars(
+                            select(models.Post.id).filter(
+                                models.Post.id.in_(unchanged)
+                            )
+                        )
+                    ).all()
+                )
+        except Exception as error:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={
+                    "message": "Error applying votes",
+                    "reason": self.get_detailed_error(error),
+                },
+            ) from error
+
+        if added or deleted:
+            invalidate_on_commit(db, invalidate_posts, *added, *deleted)
+
+        results = []
+        for vote in votes:
+            if vote.post_id in added:
+                result = "added"
+            elif vote.post_id in deleted:
+                result = "deleted"
+            elif vote.post_id not in existing_posts:
+                result = "post not found"
+            elif vote.status:
+                result = "already voted"
+            else:
+                result = "vote not found"
+            results.append({**vote.model_dump(), "result": result})
+
+        return results
+
+
+class FollowCrud(APICrudBase[models.Follow, schemas.Follow]):
+    """CRUD operations for the Follow model."""
+
+    def __init__(self, model: models.Follow = models.Follow):
+        super().__init__(model)
+
+    async def create_or_delete(
+        self, db: AsyncSession, follow: schemas.Follow, user_id: UUID
+    ) -> dict[str, str]:
+        """
+        Follows or unfollows a user.
+
+        Following a user backfills the follower's home timeline with their
+        latest `TIMELINE_BACKFILL_SIZE` posts, unfollowing them removes all
+        their posts from it.
+        """
+        if follow.user_id == user_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="You can't follow yourself",
+            )
+
+        if follow.status:
+            statement = (
+                insert(self.model)
+                .values(follower_id=user_id, followed_id=follow.user_id)
+                .on_conflict_do_nothing()
+                .returning(self.model.followed_id)
+            )
         else:
-            if not vote_found:
+            statement = (
+                delete(self.model)
+                .filter(
+                    self.model.follower_id == user_id,
+                    self.model.followed_id == follow.user_id,
+                )
+                .returning(self.model.followed_id)
+            )
+
+        try:
+            changed = await db.scalar(statement)
+        except IntegrityError as error:
+            if getattr(error.orig, "pgcode", None) == FOREIGN_KEY_VIOLATION:
                 raise HTTPException(
+                    detail="User not found",
                     status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Vote does not exist.",
+                ) from error
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={
+                    "message": "Error following user",
+                    "reason": self.get_detailed_error(error),
+                },
+            ) from error
+
+        if changed is None:
+            if follow.status:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="You already follow this user",
+                )
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="You don't follow this user",
+            )
+
+        entry = models.TimelineEntry
+        if follow.status:
+            # authors merged in on read have nothing to backfill
+            latest_posts = (
+                select(
+                    literal(user_id, Uuid),
+                    models.Post.id,
+                    models.Post.user_id,
+                    models.Post.created_at,
+                )
+                .join(models.Post.user)
+                .filter(
+                    models.Post.user_id == follow.user_id,
+                    not_(PostCrud.get_pulled_author_filter()),
+                )
+                .order_by(
+                    models.Post.created_at.desc(), models.Post.id.desc()
+                )
+                .limit(settings.timeline_backfill_size)
+            )
+            await db.execute(
+                insert(entry)
+                .from_select(
+                    ["user_id", "post_id", "author_id", "created_at"],
+                    latest_posts,
                 )
+                .on_conflict_do_nothing()
+            )
+            return {"message": "User followed successfully"}
+
+        await db.execute(
+            delete(entry).filter(
+                entry.user_id == user_id, entry.author_id == follow.user_id
+            )
+        )
+        return {"message": "User unfollowed successfully"}
+
+
+class UserCrud(APICrudBase[models.User, schemas.User]):
+    """CRUD operations for the User model."""
+
+    def __init__(self, model: models.User = models.User):
+        super().__init__(model)
+
+    async def update(self, *, db: AsyncSession, **kwargs):
+        """Update a user and drop it from the user cache."""
+        user = await super().update(db=db, **kwargs)
+        invalidate_on_commit(db, user_cache.delete, str(user.id))
+        # the user's email is part of every post they own
+        invalidate_on_commit(db, invalidate_all_posts)
+        return user
+
+    async def partial_update(self, *, db: AsyncSession, **kwargs):
+        """Partially update a user and drop it from the user cache."""
+        user = await super().partial_update(db=db, **kwargs)
+        invalidate_on_commit(db, user_cache.delete, str(user.id))
+        # the user's email is part of every post they own
+        invalidate_on_commit(db, invalidate_all_posts)
+        return user
 
-            vote_found.delete(db=db)
-            return {"message": "Vote deleted successfully"}
+    async def delete(self, db: AsyncSession, obj_id: str, obj_owner_id: str):
+        """Delete a user and drop it from the user cache."""
+        await super().delete(db=db, obj_id=obj_id, obj_owner_id=obj_owner_id)
+        invalidate_on_commit(db, user_cache.delete, str(obj_owner_id))
+        invalidate_on_commit(db, invalidate_all_posts)
 
 
-crud_user = APICrudBase[models.User, schemas.User](models.User)
+crud_user = UserCrud()
 crud_post = PostCrud()
 crud_vote = VoteCrud()
+crud_follow = FollowCrud()
@@ -1,6 +1,17 @@
-from sqlalchemy import create_engine
+from time import perf_counter
+
+from sqlalchemy import (
+    AsyncAdaptedQueuePool,
+    Engine,
+    PoolProxiedConnection,
+    create_engine,
+    event,
+)
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
+from posts_app import metrics
+from posts_app.cache import run_invalidations
 from posts_app.config import settings
 
 SQLALCHEMY_DATABASE_URL = (
@@ -8,17 +19,89 @@ SQLALCHEMY_DATABASE_URL = (
     f"{settings.db_user}:{settings.db_password}"
     f"@{settings.db_host}:{settings.db_port}/{settings.db_name}"
 )
+ASYNC_SQLALCHEMY_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace(
+    "postgresql://", "postgresql+asyncpg://", 1
+)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Connection pool measuring how long checkouts wait for a connection."""
+
+    def connect(self) -> PoolProxiedConnection:
+        start = perf_counter()
+        try:
+            return super().connect()
+        finally:
+            metrics.db_pool_wait_seconds.observe(perf_counter() - start)
 
+
+# the synchronous engine is kept for migrations and maintenance scripts, the
+# API itself only talks to the database through the async engine.
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL,
+    poolclass=InstrumentedPool,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=settings.db_pool_pre_ping,
+    connect_args={
+        "server_settings": {
+            "statement_timeout": str(settings.db_statement_timeout)
+        }
+    },
+)
+
+
+def record_query_start(conn, cursor, statement, parameters, context, many):
+    conn.info.setdefault("query_start", []).append(perf_counter())
+
+
+def record_query_end(conn, cursor, statement, parameters, context, many):
+    elapsed = perf_counter() - conn.info["query_start"].pop()
+    timings = metrics.request_timings.get()
+    if timings is not None:
+        timings.db_seconds += elapsed
+        timings.db_queries += 1
+
+
+def instrument_engine(engine: Engine):
+    """Adds the queries run by an engine to the timings of requests."""
+    event.listen(engine, "before_cursor_execute", record_query_start)
+    event.listen(engine, "after_cursor_execute", record_query_end)
+
+
+instrument_engine(async_engine.sync_engine)
+
+metrics.db_pool_size.set_function(async_engine.pool.size)
+metrics.db_pool_checked_out.set_function(async_engine.pool.checkedout)
+metrics.db_pool_overflow.set_function(
+    lambda: max(async_engine.pool.overflow(), 0)
+)
 
 DBSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncDBSession = async_sessionmaker(
+    autoflush=False, expire_on_commit=False, bind=async_engine
+)
 
 Base = declarative_base()
 
 
-def get_db():
-    db = DBSession()
-    try:
+async def get_db():
+    # the connection is only checked out by the first query, requests served
+    # from caches don't hold one
+    async with AsyncDBSession() as db:
         yield db
-    finally:
-        db.close()
+        # everything the request wrote is committed at once, requests failing
+        # with an error are rolled back when the session closes
+        await db.commit()
+        await run_invalidations(db)
+
+
+def get_session_factory() -> async_sessionmaker:
+    """
+    Returns the factory of sessions for work outliving the request's own
+    session, like streamed responses.
+    """
+    return AsyncDBSession
@@ -0,0 +1,102 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Iterator
+
+from prometheus_client import Counter, Gauge, Histogram
+
+db_pool_size = Gauge(
+    "db_pool_size", "Number of connections the database pool keeps open."
+)
+db_pool_checked_out = Gauge(
+    "db_pool_checked_out", "Number of connections currently in use."
+)
+db_pool_overflow = Gauge(
+    "db_pool_overflow",
+    "Number of connections opened beyond the pool size.",
+)
+db_pool_wait_seconds = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a database connection.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, 30),
+)
+token_cache_hits = Counter(
+    "token_cache_hits", "Access tokens found in the verified token cache."
+)
+token_cache_misses = Counter(
+    "token_cache_misses",
+    "Access tokens that had to be decoded and verified.",
+)
+http_request_seconds = Histogram(
+    "http_request_seconds",
+    "Time spent handling requests.",
+    ["method", "route", "status_code"],
+)
+http_request_db_seconds = Histogram(
+    "http_request_db_seconds",
+    "Time requests spent waiting on database queries.",
+    ["method", "route"],
+)
+http_request_db_queries = Histogram(
+    "http_request_db_queries",
+    "Number of database queries run by requests.",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100),
+)
+http_request_serialization_seconds = Histogram(
+    "http_request_serialization_seconds",
+    "Time requests spent serializing their responses.",
+    ["method", "route"],
+)
+
+trending_refreshed_at = Gauge(
+    "trending_refreshed_at",
+    "Unix time the trending posts were last refreshed by this worker.",
+)
+trending_refresh_failures = Counter(
+    "trending_refresh_failures",
+    "Periodic refreshes of the trending posts that failed.",
+)
+
+
+class RequestTimings:
+    """Where the time handling the current request went."""
+
+    def __init__(self):
+        self.start = perf_counter()
+        self.db_seconds = 0.0
+        self.db_queries = 0
+        self.serialization_seconds = 0.0
+
+    @property
+    def total_seconds(self) -> float:
+        return perf_counter() - self.start
+
+    def get_server_timing(self) -> str:
+        """Returns the timings as the value of a `Server-Timing` header."""
+        return ", ".join(
+            [
+                f"app;dur={self.total_seconds * 1000:.2f}",
+                f'db;desc="{self.db_queries} queries"'
+                f";dur={self.db_seconds * 1000:.2f}",
+                f"serialize;dur={self.serialization_seconds * 1000:.2f}",
+            ]
+        )
+
+
+# set by the instrumentation middleware for the duration of each request
+request_timings: ContextVar[RequestTimings | None] = ContextVar(
+    "request_timings", default=None
+)
+
+
+@contextmanager
+def track_serialization() -> Iterator[None]:
+    """Adds the time spent in the block to the current request's timings."""
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings = request_timings.get()
+        if timings is not None:
+            timings.serialization_seconds += perf_counter() - start
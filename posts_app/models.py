@@ -1,8 +1,24 @@
-from datetime import datetime
 from uuid import uuid4
 
 import sqlalchemy
-from sqlalchemy import TIMESTAMP, Boolean, ForeignKey, String, func, text
+from sqlalchemy import (
+    DDL,
+    TIMESTAMP,
+    Boolean,
+    CheckConstraint,
+    Computed,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    column,
+    event,
+    func,
+    table,
+    text,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from posts_app.database import Base
@@ -13,6 +29,19 @@ class Post(Base, UtilMixin):
     """Model for posts"""
 
     __tablename__ = "posts"
+    # fetch columns generated by the database through RETURNING on flush
+    __mapper_args__ = {"eager_defaults": True}
+    __table_args__ = (
+        Index("ix_posts_created_at_id", "created_at", "id"),
+        # a user's posts in keyset order, also used by the ON DELETE CASCADE
+        # of users
+        Index(
+            "ix_posts_user_id_created_at_id", "user_id", "created_at", "id"
+        ),
+        Index(
+            "ix_posts_search_vector", "search_vector", postgresql_using="gin"
+        ),
+    )
 
     id: Mapped[sqlalchemy.Uuid] = mapped_column(
         sqlalchemy.Uuid,
@@ -25,6 +54,9 @@ class Post(Base, UtilMixin):
     title: Mapped[str] = mapped_column(String, index=True)
     content: Mapped[str] = mapped_column(String, index=True)
     published: Mapped[bool] = mapped_column(Boolean, server_default="True")
+    vote_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
     created_at: Mapped[TIMESTAMP] = mapped_column(
         TIMESTAMP(timezone=True), server_default=text("now()")
     )
@@ -32,13 +64,24 @@ class Post(Base, UtilMixin):
         TIMESTAMP(timezone=True),
         nullable=False,
         server_default=text("now()"),
-        onupdate=datetime.now,
+        onupdate=func.now(),
     )
     user_id: Mapped[sqlalchemy.Uuid] = mapped_column(
         sqlalchemy.Uuid,
         ForeignKey("users.id", ondelete="CASCADE"),
     )
-    user: Mapped["User"] = relationship()
+    # loaded eagerly, the async session can't lazy load it on serialization.
+    # PostCrud queries choose their own strategy, see `get_user_loader`.
+    user: Mapped["User"] = relationship(lazy="joined")
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(content, '')), 'B')",
+            persisted=True,
+        ),
+        deferred=True,
+    )
 
     def __str__(self):
         return f"Post title: {self.title}"
@@ -48,6 +91,7 @@ class User(Base, UtilMixin):
     """Model for users."""
 
     __tablename__ = "users"
+    __mapper_args__ = {"eager_defaults": True}
 
     id: Mapped[sqlalchemy.Uuid] = mapped_column(
         sqlalchemy.Uuid,
@@ -59,13 +103,22 @@ class User(Base, UtilMixin):
     )
     email: Mapped[str] = mapped_column(String, unique=True, index=True)
     password: Mapped[str] = mapped_column(String)
+    follower_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+    # set once the user had too many followers, or posted too much at once,
+    # to be fanned out to their followers' timelines. Their posts are merged
+    # into them on read from then on, even if their followers drop back
+    fan_out_on_read: Mapped[bool] = mapped_column(
+        Boolean, nullable=False, default=False, server_default="false"
+    )
     created_at: Mapped[TIMESTAMP] = mapped_column(
         TIMESTAMP(timezone=True), server_default=text("now()")
     )
     updated_at: Mapped[TIMESTAMP] = mapped_column(
         TIMESTAMP(timezone=True),
         server_default=text("now()"),
-        onupdate=datetime.now,
+        onupdate=func.now(),
     )
 
     def __str__(self):
@@ -76,6 +129,68 @@ class Vote(Base, UtilMixin):
     """Model for votes."""
 
     __tablename__ = "votes"
+    # the primary key leads with user_id, votes of a post, like those removed
+    # by the ON DELETE CASCADE of posts, are found through this one
+    __table_args__ = (Index("ix_votes_post_id", "post_id"),)
+
+    user_id: Mapped[sqlalchemy.Uuid] = mapped_column(
+        sqlalchemy.Uuid,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    post_id: Mapped[sqlalchemy.Uuid] = mapped_column(
+        sqlalchemy.Uuid,
+        ForeignKey("posts.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+
+
+class Follow(Base, UtilMixin):
+    """Model for users following other users."""
+
+    __tablename__ = "follows"
+    # the primary key leads with follower_id, the followers of a user, like
+    # those fanned out to when they post, are found through this one
+    __table_args__ = (
+        Index("ix_follows_followed_id", "followed_id"),
+        CheckConstraint(
+            "follower_id <> followed_id", name="ck_follows_not_self"
+        ),
+    )
+
+    follower_id: Mapped[sqlalchemy.Uuid] = mapped_column(
+        sqlalchemy.Uuid,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    followed_id: Mapped[sqlalchemy.Uuid] = mapped_column(
+        sqlalchemy.Uuid,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    created_at: Mapped[TIMESTAMP] = mapped_column(
+        TIMESTAMP(timezone=True), server_default=text("now()")
+    )
+
+
+class TimelineEntry(Base, UtilMixin):
+    """
+    Model for the posts written to the home timelines of their author's
+    followers.
+    """
+
+    __tablename__ = "timeline_entries"
+    __table_args__ = (
+        # a timeline in keyset order
+        Index(
+            "ix_timeline_entries_user_id_created_at_post_id",
+            "user_id",
+            "created_at",
+            "post_id",
+        ),
+        # used by the ON DELETE CASCADE of posts
+        Index("ix_timeline_entries_post_id", "post_id"),
+    )
 
     user_id: Mapped[sqlalchemy.Uuid] = mapped_column(
         sqlalchemy.Uuid,
@@ -87,3 +202,140 @@ class Vote(Base, UtilMixin):
         ForeignKey("posts.id", ondelete="CASCADE"),
         primary_key=True,
     )
+    # copied from the post, entries go away along with their posts
+    author_id: Mapped[sqlalchemy.Uuid] = mapped_column(
+        sqlalchemy.Uuid, nullable=False
+    )
+    created_at: Mapped[TIMESTAMP] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=False
+    )
+
+
+# keep posts.vote_count in sync with the votes table, this also covers votes
+# removed through the ON DELETE CASCADE of their user or post.
+update_post_vote_count_function = DDL(
+    """
+    CREATE OR REPLACE FUNCTION update_post_vote_count() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE posts SET vote_count = vote_count + 1
+            WHERE id = NEW.post_id;
+            RETURN NEW;
+        END IF;
+        UPDATE posts SET vote_count = vote_count - 1 WHERE id = OLD.post_id;
+        RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql;
+    """
+)
+update_post_vote_count_trigger = DDL(
+    """
+    CREATE TRIGGER votes_update_post_vote_count
+    AFTER INSERT OR DELETE ON votes
+    FOR EACH ROW EXECUTE FUNCTION update_post_vote_count();
+    """
+)
+
+event.listen(
+    Vote.__table__,
+    "after_create",
+    update_post_vote_count_function.execute_if(dialect="postgresql"),
+)
+event.listen(
+    Vote.__table__,
+    "after_create",
+    update_post_vote_count_trigger.execute_if(dialect="postgresql"),
+)
+
+
+# keep users.follower_count in sync with the follows table, this also covers
+# follows removed through the ON DELETE CASCADE of either user.
+update_user_follower_count_function = DDL(
+    """
+    CREATE OR REPLACE FUNCTION update_user_follower_count()
+    RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE users SET follower_count = follower_count + 1
+            WHERE id = NEW.followed_id;
+            RETURN NEW;
+        END IF;
+        UPDATE users SET follower_count = follower_count - 1
+        WHERE id = OLD.followed_id;
+        RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql;
+    """
+)
+update_user_follower_count_trigger = DDL(
+    """
+    CREATE TRIGGER follows_update_user_follower_count
+    AFTER INSERT OR DELETE ON follows
+    FOR EACH ROW EXECUTE FUNCTION update_user_follower_count();
+    """
+)
+
+event.listen(
+    Follow.__table__,
+    "after_create",
+    update_user_follower_count_function.execute_if(dialect="postgresql"),
+)
+event.listen(
+    Follow.__table__,
+    "after_create",
+    update_user_follower_count_trigger.execute_if(dialect="postgresql"),
+)
+
+# posts ranked by their votes and their age, for the trending feed. Votes
+# count in orders of magnitude, ten times the votes weigh as much as being
+# 12.5 hours newer. Scores are measured from a fixed epoch rather than from
+# now(), so they only change along with the votes of their posts and a
+# concurrent refresh, which requires the unique index on post_id, only
+# rewrites those rows and the ones entering or leaving the week. The score
+# index lets pages be read as keyset ranges.
+trending_posts = table(
+    "trending_posts",
+    column("post_id", sqlalchemy.Uuid),
+    column("score", Float),
+)
+
+create_trending_posts_view = DDL(
+    """
+    CREATE MATERIALIZED VIEW trending_posts AS
+    SELECT
+        id AS post_id,
+        (
+            log(vote_count)
+            + extract(epoch FROM created_at - '2024-01-01 00:00+00') / 45000
+        )::double precision AS score
+    FROM posts
+    WHERE vote_count > 0 AND created_at > now() - interval '7 days'
+    """
+)
+create_trending_posts_indexes = DDL(
+    """
+    CREATE UNIQUE INDEX ix_trending_posts_post_id
+    ON trending_posts (post_id);
+    CREATE INDEX ix_trending_posts_score_post_id
+    ON trending_posts (score, post_id);
+    """
+)
+drop_trending_posts_view = DDL(
+    "DROP MATERIALIZED VIEW IF EXISTS trending_posts"
+)
+
+event.listen(
+    Post.__table__,
+    "after_create",
+    create_trending_posts_view.execute_if(dialect="postgresql"),
+)
+event.listen(
+    Post.__table__,
+    "after_create",
+    create_trending_posts_indexes.execute_if(dialect="postgresql"),
+)
+event.listen(
+    Post.__table__,
+    "before_drop",
+    drop_trending_posts_view.execute_if(dialect="postgresql"),
+)
@@ -1,17 +1,29 @@
+import hashlib
+import time
 from datetime import datetime, timedelta
 from typing import Annotated
+from uuid import UUID
 
 import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jwt.exceptions import InvalidTokenError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from posts_app import models, schemas
+from posts_app import metrics, models, schemas
 from posts_app.api.routers.deps import DBSessionDependency
+from posts_app.cache import MemoryCache, user_cache
 from posts_app.config import settings
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/login")
 
+# tokens that were already verified, keyed by their digest and kept until
+# they expire.
+token_cache = MemoryCache(
+    ttl=settings.access_token_expire_minutes * 60,
+    max_size=settings.token_cache_size,
+)
+
 
 def create_access_token(
     data: dict, expires_delta: timedelta | None = None
@@ -39,6 +51,13 @@ async def verify_access_token(
     credentials_exception: HTTPException,
 ) -> schemas.TokenData:
     """Verifies that the token being used is valid"""
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    token_data = await token_cache.get(digest)
+    if token_data is not None:
+        metrics.token_cache_hits.inc()
+        return token_data
+
+    metrics.token_cache_misses.inc()
     try:
         payload = jwt.decode(
             token, settings.secret_key, algorithms=[settings.oauth2_algorithm]
@@ -51,12 +70,31 @@ async def verify_access_token(
     except InvalidTokenError as error:
         raise credentials_exception from error
 
+    expires_in = payload.get("exp", 0) - time.time()
+    if expires_in > 0:
+        await token_cache.set(digest, token_data, ttl=expires_in)
+
     return token_data
 
 
+async def get_user(db: AsyncSession, user_id: UUID) -> schemas.User | None:
+    """Returns a user by its id, going to the database on cache misses."""
+    cached_user = await user_cache.get(str(user_id))
+    if cached_user is not None:
+        return schemas.User.model_validate_json(cached_user)
+
+    user = await db.get(models.User, user_id)
+    if not user:
+        return None
+
+    user = schemas.User.model_validate(user)
+    await user_cache.set(str(user_id), user.model_dump_json())
+    return user
+
+
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)], db: DBSessionDependency
-) -> models.User:
+) -> schemas.User:
     """Returns the current authenticated user."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -66,7 +104,7 @@ async def get_current_user(
 
     token_data = await verify_access_token(token, credentials_exception)
 
-    user = db.query(models.User).get(token_data.id)
+    user = await get_user(db, token_data.id)
     if not user:
         raise credentials_exception
 
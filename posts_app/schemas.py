@@ -57,6 +57,29 @@ class PostCreateUpdate(PostBase):
     }
 
 
+class PostBatchCreate(BaseModel):
+    """Schema for creating many posts at once."""
+
+    posts: List[PostCreateUpdate] = Field(..., min_length=1, max_length=1000)
+
+
+class PostBatchDelete(BaseModel):
+    """Schema for deleting many posts at once."""
+
+    ids: List[UUID] = Field(..., min_length=1, max_length=1000)
+
+
+class PostBatchDeleteResponse(BaseModel):
+    """
+    Schema for the response of deleting many posts.
+
+    - **deleted**: The ids of the deleted posts, posts that don't exist or
+      belong to someone else are not deleted.
+    """
+
+    deleted: List[UUID]
+
+
 class PostPartialUpdate(BaseModel):
     """Schema for updating a post partially."""
 
@@ -74,6 +97,8 @@ class MetaData(BaseModel):
     links: Link
     status_code: int
     count: int
+    total_count: int
+    total_count_estimated: bool
     total_pages: int
     current_page: int
 
@@ -85,6 +110,24 @@ class PostsList(BaseModel):
     metadata: MetaData
 
 
+class TimelineMetaData(BaseModel):
+    links: Link
+    status_code: int
+    count: int
+
+
+class Timeline(BaseModel):
+    """
+    Schema for the response of the home timeline.
+
+    Timelines are read forward only, follow the `next` link in the metadata
+    for older posts.
+    """
+
+    data: List[PostResponse]
+    metadata: TimelineMetaData
+
+
 class UserBase(BaseModel):
     email: EmailStr
 
@@ -133,6 +176,32 @@ class Vote(BaseModel):
     status: bool
 
 
+class VoteBatch(BaseModel):
+    """Schema for adding and removing many votes at once."""
+
+    votes: List[Vote] = Field(..., min_length=1, max_length=100)
+
+
+class VoteResult(Vote):
+    """
+    Schema for the outcome of a vote in a batch.
+
+    - **result**: One of `added`, `deleted`, `already voted`,
+      `vote not found` or `post not found`.
+    """
+
+    result: str
+
+
+class VoteBatchResponse(BaseModel):
+    results: List[VoteResult]
+
+
+class Follow(BaseModel):
+    user_id: UUID
+    status: bool
+
+
 class PostOwner(BaseModel):
     email: EmailStr
     id: UUID
@@ -1,15 +1,71 @@
-from fastapi import HTTPException, Request, status
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Callable
+from uuid import UUID
+
+from fastapi import HTTPException, Request, Response, status
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from posts_app.config import settings
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.password_hash_rounds,
+)
+
+
+class PasswordHasher:
+    """
+    Runs the password hashing functions in a bounded pool of threads.
+
+    Hashing keeps the CPU busy for a long time, so it is moved off the event
+    loop. Once every worker is busy and the queue is full, new jobs are
+    turned away with a 429 instead of piling up.
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hasher"
+        )
+        self.max_pending = workers + queue_size
+        self.pending = 0
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        """Runs the function in the pool once there's room for it."""
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="The server is busy, try again later.",
+                headers={"Retry-After": "1"},
+            )
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+
+
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    queue_size=settings.password_hash_queue_size,
+)
 
 
 class UtilMixin:
     def to_dict(self):
         return {c.name: getattr(self, c.name) for c in self.__table__.columns}
 
-    def save(self, db: Session, **kwargs):
+    async def save(self, db: AsyncSession, **kwargs):
         """Saves or updates the post object."""
         for key, value in kwargs.items():
             if value is None:
@@ -21,24 +77,131 @@ class UtilMixin:
                     },
                 )
             if key == "password":
-                value = pwd_context.hash(value)
+                value = await hash_password(value)
 
             setattr(self, key, value)
 
+        # the request's transaction is committed once by `get_db`, columns
+        # generated by the database come back through RETURNING
         db.add(self)
-        db.commit()
-        db.refresh(self)
+        await db.flush()
         return self
 
-    def delete(self, db: Session):
+    async def delete(self, db: AsyncSession):
         """Deletes the post object."""
-        db.delete(self)
-        db.commit()
+        await db.delete(self)
+        await db.flush()
 
 
 def get_query_params(request: Request):
     return request.query_params
 
 
-def is_valid_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+def is_not_modified(
+    request: Request, etag: str, last_modified: datetime | None = None
+) -> bool:
+    """Checks whether the client's copy of a response is still current."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-Modified-Since is ignored when both headers are sent
+        etags = {
+            tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+        }
+        return "*" in etags or etag in etags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+
+    # HTTP dates don't go below seconds
+    return last_modified.replace(microsecond=0) <= since
+
+
+def get_json_response(
+    request: Request,
+    content: str | bytes,
+    last_modified: datetime | None = None,
+) -> Response:
+    """
+    Returns an already serialized JSON body tagged with its ETag.
+
+    A body-less 304 response is returned instead when the client's
+    `If-None-Match` or `If-Modified-Since` header shows its copy is current.
+    """
+    if isinstance(content, str):
+        content = content.encode()
+
+    etag = f'"{hashlib.blake2b(content, digest_size=16).hexdigest()}"'
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(
+            last_modified.astimezone(timezone.utc), usegmt=True
+        )
+
+    if is_not_modified(request, etag, last_modified):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=headers
+        )
+
+    return Response(
+        content=content, media_type="application/json", headers=headers
+    )
+
+
+async def hash_password(password: str) -> str:
+    return await password_hasher.run(pwd_context.hash, password)
+
+
+async def is_valid_password(plain_password, hashed_password):
+    return await password_hasher.run(
+        pwd_context.verify, plain_password, hashed_password
+    )
+
+
+def encode_cursor(
+    key: datetime | float, obj_id: UUID, page: int, direction: str = "next"
+) -> str:
+    """
+    Encodes a keyset position, a creation date or a score, into an opaque
+    pagination cursor.
+    """
+    if isinstance(key, datetime):
+        key = key.isoformat()
+    payload = json.dumps([key, str(obj_id), page, direction])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(
+    cursor: str, key_type: type = datetime
+) -> tuple[Any, UUID, int, str]:
+    """
+    Decodes a pagination cursor back into its keyset position, whose first
+    member is of `key_type`, and the number of the page it points to.
+    """
+    try:
+        key, obj_id, page, direction = json.loads(
+            base64.urlsafe_b64decode(cursor.encode())
+        )
+        if direction not in ("next", "previous"):
+            raise ValueError(f"unknown cursor direction {direction}")
+        if not isinstance(page, int) or page < 1:
+            raise ValueError(f"invalid cursor page {page}")
+        if key_type is datetime:
+            key = datetime.fromisoformat(key)
+        elif isinstance(key, (int, float)) and not isinstance(key, bool):
+            key = key_type(key)
+        else:
+            raise TypeError(f"invalid cursor key {key}")
+        return key, UUID(obj_id), page, direction
+    except (binascii.Error, TypeError, ValueError) as error:
+        raise HTTPException(
+            detail="invalid cursor",
+            status_code=status.HTTP_400_BAD_REQUEST,
+        ) from error
@@ -1,13 +1,23 @@
+import asyncio
 import subprocess
+from uuid import uuid4
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import NullPool, create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
 
 from posts_app.api.main import app
+from posts_app.cache import invalidate_all_posts, run_invalidations
 from posts_app.config import settings
-from posts_app.database import Base, get_db
+from posts_app.database import (
+    Base,
+    get_db,
+    get_session_factory,
+    instrument_engine,
+)
+from posts_app.models import Post
 
 
 @pytest.fixture(scope="package", autouse=True)
@@ -44,14 +54,116 @@ def session():
         db.close()
 
 
+@pytest.fixture(scope="session")
+def async_session_factory(session: Session) -> async_sessionmaker:
+    # every test client request runs in its own event loop, so connections
+    # can't be pooled across requests.
+    engine = create_async_engine(
+        "postgresql+asyncpg://"
+        f"{settings.db_user}:{settings.db_password}@"
+        f"localhost/{settings.db_name}_test",
+        poolclass=NullPool,
+    )
+    instrument_engine(engine.sync_engine)
+
+    return async_sessionmaker(
+        autoflush=False, expire_on_commit=False, bind=engine
+    )
+
+
+@pytest.fixture(scope="function", autouse=True)
+def clear_post_caches():
+    # tests seed posts straight into the database, behind the cache's back
+    asyncio.run(invalidate_all_posts())
+
+
 @pytest.fixture(scope="function")
-def api_client(session: Session):
-    def override_get_db():
-        try:
-            yield session
-        finally:
-            session.close()
+def api_client(async_session_factory: async_sessionmaker):
+    async def override_get_db():
+        async with async_session_factory() as db:
+            yield db
+            await db.commit()
+            await run_invalidations(db)
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = (
+        lambda: async_session_factory
+    )
 
     yield TestClient(app)
+
+
+@pytest.fixture(scope="function")
+def test_user(api_client: TestClient) -> dict:
+    user_data = {
+        "email": f"{uuid4().hex}@email.com",
+        "password": "password1234",
+    }
+    response = api_client.post("/api/users/", json=user_data)
+    assert response.status_code == 201
+
+    return {**response.json(), "password": user_data["password"]}
+
+
+@pytest.fixture(scope="function")
+def token(api_client: TestClient, test_user: dict) -> str:
+    response = api_client.post(
+        "/api/login",
+        data={
+            "username": test_user["email"],
+            "password": test_user["password"],
+        },
+    )
+    assert response.status_code == 200
+
+    return response.json()["access_token"]
+
+
+@pytest.fixture(scope="function")
+def authorized_client(api_client: TestClient, token: str) -> TestClient:
+    client = TestClient(app)
+    client.headers = {**client.headers, "Authorization": f"Bearer {token}"}
+
+    return client
+
+
+@pytest.fixture(scope="function")
+def test_author(api_client: TestClient) -> dict:
+    """Another user, along with a client authenticated as them."""
+    user_data = {
+        "email": f"{uuid4().hex}@email.com",
+        "password": "password1234",
+    }
+    response = api_client.post("/api/users/", json=user_data)
+    assert response.status_code == 201
+    author = response.json()
+
+    response = api_client.post(
+        "/api/login",
+        data={"username": user_data["email"], "password": "password1234"},
+    )
+    assert response.status_code == 200
+    client = TestClient(app)
+    client.headers = {
+        **client.headers,
+        "Authorization": f"Bearer {response.json()['access_token']}",
+    }
+
+    return {**author, "client": client}
+
+
+@pytest.fixture(scope="function")
+def test_posts(session: Session, test_user: dict) -> list[Post]:
+    posts = [
+        Post(
+            title=f"Post {i}", content=f"Content {i}", user_id=test_user["id"]
+        )
+        for i in range(7)
+    ]
+    session.add_all(posts)
+    session.commit()
+    for post in posts:
+        session.refresh(post)
+    session.close()
+
+    return posts
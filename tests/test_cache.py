@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from fakeredis import FakeAsyncRedis
+
+from posts_app.cache import MemoryCache, RedisCache
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(ttl=60, max_size=2)
+
+    async def run():
+        await cache.set("a", 1)
+        await cache.set("b", 2)
+        await cache.get("a")
+        await cache.set("c", 3)
+        return [await cache.get(key) for key in ("a", "b", "c")]
+
+    assert asyncio.run(run()) == [1, None, 3]
+
+
+def test_memory_cache_expires_entries():
+    cache = MemoryCache(ttl=60, max_size=2)
+
+    async def run():
+        await cache.set("a", 1, ttl=-1)
+        await cache.set("b", 2)
+        return await cache.get("a"), await cache.get("b")
+
+    assert asyncio.run(run()) == (None, 2)
+    assert "a" not in cache.entries
+
+
+def test_redis_cache():
+    cache = RedisCache(
+        FakeAsyncRedis(), ttl=60, prefix="test", clearable=True
+    )
+
+    async def run():
+        await cache.set("a", "1")
+        await cache.set("b", "2")
+        await cache.delete("a")
+        values = [await cache.get("a"), await cache.get("b")]
+        await cache.clear()
+        return values, await cache.get("b")
+
+    assert asyncio.run(run()) == ([None, b"2"], None)
+
+
+def test_redis_cache_clear_starts_a_new_generation():
+    client = FakeAsyncRedis()
+    cache = RedisCache(client, ttl=60, prefix="test", clearable=True)
+    other_cache = RedisCache(client, ttl=60, prefix="other")
+
+    async def run():
+        await cache.set("a", "1")
+        await other_cache.set("a", "2")
+        await cache.clear()
+        await cache.set("b", "3")
+        return [
+            await cache.get("a"),
+            await cache.get("b"),
+            await other_cache.get("a"),
+        ]
+
+    assert asyncio.run(run()) == [None, b"3", b"2"]
+
+
+def test_redis_cache_keys_are_only_scoped_to_a_generation_if_clearable():
+    client = FakeAsyncRedis()
+    cache = RedisCache(client, ttl=60, prefix="test")
+
+    async def run():
+        await cache.set("a", "1")
+        return await client.keys()
+
+    # entries of caches that can't be cleared are read in a single lookup
+    assert asyncio.run(run()) == [b"test:a"]
+    with pytest.raises(TypeError):
+        asyncio.run(cache.clear())
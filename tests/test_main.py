@@ -1,6 +1,13 @@
+import asyncio
+
 from fastapi.testclient import TestClient
 import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy.ext.asyncio import create_async_engine
+
 from posts_app.api.main import app
+from posts_app.config import settings
+from posts_app.database import InstrumentedPool
 from fastapi import status
 
 
@@ -19,3 +26,51 @@ def test_unknown_route(api_client):
     response = api_client.get("/api/invalid")
     assert response.status_code == status.HTTP_404_NOT_FOUND
     assert response.json() == {"detail": "Not Found"}
+
+
+def test_api_metrics(api_client):
+    response = api_client.get("/api/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert "db_pool_checked_out" in response.text
+    assert "db_pool_wait_seconds_bucket" in response.text
+
+
+def test_server_timing_header(api_client):
+    response = api_client.get("/api/status")
+    timings = {
+        metric.split(";")[0]: metric
+        for metric in response.headers["server-timing"].split(", ")
+    }
+    assert set(timings) == {"app", "db", "serialize"}
+    assert 'desc="0 queries"' in timings["db"]
+
+
+def test_request_metrics(api_client):
+    api_client.get("/api/status")
+    response = api_client.get("/api/metrics")
+    assert (
+        'http_request_seconds_count{method="GET",route="/api/status",'
+        'status_code="200"}' in response.text
+    )
+    assert "http_request_db_queries_bucket" in response.text
+
+
+def test_pool_wait_is_measured_on_checkout():
+    engine = create_async_engine(
+        "postgresql+asyncpg://"
+        f"{settings.db_user}:{settings.db_password}@"
+        f"localhost/{settings.db_name}_test",
+        poolclass=InstrumentedPool,
+    )
+
+    async def check_out():
+        async with engine.connect():
+            pass
+        await engine.dispose()
+
+    def get_checkouts() -> float:
+        return REGISTRY.get_sample_value("db_pool_wait_seconds_count")
+
+    checkouts = get_checkouts()
+    asyncio.run(check_out())
+    assert get_checkouts() == checkouts + 1
@@ -0,0 +1,43 @@
+import asyncio
+from datetime import timedelta
+from uuid import uuid4
+
+import pytest
+from fastapi import HTTPException
+from prometheus_client import REGISTRY
+
+from posts_app import oauth2
+
+credentials_exception = HTTPException(status_code=401)
+
+
+def test_verified_tokens_are_cached():
+    token = oauth2.create_access_token(
+        data={"sub": str(uuid4()), "email": "cached@email.com"}
+    )
+    hits = REGISTRY.get_sample_value("token_cache_hits_total")
+    misses = REGISTRY.get_sample_value("token_cache_misses_total")
+
+    first = asyncio.run(
+        oauth2.verify_access_token(token, credentials_exception)
+    )
+    second = asyncio.run(
+        oauth2.verify_access_token(token, credentials_exception)
+    )
+
+    assert first == second
+    assert REGISTRY.get_sample_value("token_cache_misses_total") == misses + 1
+    assert REGISTRY.get_sample_value("token_cache_hits_total") == hits + 1
+
+
+def test_expired_tokens_are_not_cached():
+    token = oauth2.create_access_token(
+        data={"sub": str(uuid4()), "email": "expired@email.com"},
+        expires_delta=timedelta(minutes=-1),
+    )
+
+    for _ in range(2):
+        with pytest.raises(HTTPException):
+            asyncio.run(
+                oauth2.verify_access_token(token, credentials_exception)
+            )
@@ -0,0 +1,303 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import status
+from sqlalchemy import event, select, text
+
+from posts_app.config import settings
+from posts_app.crud import crud_post
+from posts_app.models import Vote
+
+pytestmark = pytest.mark.usefixtures("api_client", "session")
+
+# tables that must always be reached through an index
+INDEXED_TABLES = {"posts", "votes", "trending_posts", "timeline_entries"}
+
+
+@pytest.fixture(scope="module")
+def seeded_data(session) -> dict:
+    """Seeds enough rows for the planner to pick indexes wherever it can."""
+    session.execute(
+        text(
+            """
+            INSERT INTO users (email, password)
+            SELECT 'plans-' || n || '@example.com', 'password'
+            FROM generate_series(1, 50) AS n
+            """
+        )
+    )
+    session.execute(
+        text(
+            """
+            INSERT INTO posts (title, content, user_id, created_at)
+            SELECT
+                'Post ' || n,
+                'Content of post ' || n,
+                (ARRAY(
+                    SELECT id FROM users WHERE email LIKE 'plans-%'
+                ))[1 + n % 50],
+                now() - n * interval '1 minute'
+            FROM generate_series(1, 10000) AS n
+            """
+        )
+    )
+    session.execute(
+        text(
+            """
+            INSERT INTO votes (user_id, post_id)
+            SELECT users.id, posts.id
+            FROM posts
+            JOIN users ON users.email IN (
+                'plans-1@example.com', 'plans-2@example.com'
+            )
+            WHERE posts.title LIKE 'Post %'
+            """
+        )
+    )
+    # the first user follows every other one, their posts fanned out
+    session.execute(
+        text(
+            """
+            INSERT INTO follows (follower_id, followed_id)
+            SELECT follower.id, followed.id
+            FROM users AS follower
+            JOIN users AS followed ON followed.email LIKE 'plans-%'
+            WHERE follower.email = 'plans-1@example.com'
+            AND followed.id <> follower.id
+            """
+        )
+    )
+    session.execute(
+        text(
+            """
+            INSERT INTO timeline_entries
+                (user_id, post_id, author_id, created_at)
+            SELECT follows.follower_id, posts.id, posts.user_id,
+                posts.created_at
+            FROM follows
+            JOIN posts ON posts.user_id = follows.followed_id
+            JOIN users ON users.id = follows.follower_id
+            WHERE users.email = 'plans-1@example.com'
+            """
+        )
+    )
+    session.commit()
+    for table in ("users", "posts", "votes", "follows", "timeline_entries"):
+        session.execute(text(f"ANALYZE {table}"))
+    session.commit()
+
+    seeded = {
+        "user_id": session.scalar(
+            text("SELECT id FROM users WHERE email = 'plans-1@example.com'")
+        ),
+        "post_id": session.scalar(
+            text("SELECT id FROM posts WHERE title = 'Post 5000'")
+        ),
+    }
+    session.close()
+
+    yield seeded
+
+    # posts and votes go along with their users
+    session.execute(text("DELETE FROM users WHERE email LIKE 'plans-%'"))
+    session.commit()
+    session.close()
+
+
+@pytest.fixture
+def executed_statements(async_session_factory) -> list[tuple]:
+    """Records the statements the API runs along with their parameters."""
+    statements = []
+    engine = async_session_factory.kw["bind"].sync_engine
+
+    def record_statement(conn, cursor, statement, parameters, *args):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record_statement)
+    yield statements
+    event.remove(engine, "before_cursor_execute", record_statement)
+
+
+def get_sequential_scans(
+    async_session_factory, statement: str, parameters
+) -> set[str]:
+    """
+    Runs a statement under `EXPLAIN (ANALYZE, BUFFERS)` and returns the
+    indexed tables its plan scans sequentially.
+
+    The statement is rolled back once explained.
+    """
+
+    async def explain():
+        async with async_session_factory.kw["bind"].connect() as connection:
+            result = await connection.exec_driver_sql(
+                f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}",
+                parameters,
+            )
+            return result.scalar()
+
+    plan = asyncio.run(explain())
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    scanned, nodes = set(), [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if node["Node Type"] == "Seq Scan":
+            scanned.add(node["Relation Name"])
+        nodes.extend(node.get("Plans", []))
+
+    return scanned & INDEXED_TABLES
+
+
+def assert_no_sequential_scans(async_session_factory, statements):
+    explained = 0
+    # explaining runs statements too, which would be recorded along
+    for statement, parameters in list(statements):
+        if not INDEXED_TABLES & set(statement.replace(",", " ").split()):
+            continue
+        scans = get_sequential_scans(
+            async_session_factory, statement, parameters
+        )
+        assert not scans, f"sequential scan of {scans} in {statement}"
+        explained += 1
+
+    assert explained, "no statement on an indexed table was run"
+
+
+class TestQueryPlans:
+    def test_listing(
+        self,
+        authorized_client,
+        async_session_factory,
+        seeded_data,
+        executed_statements,
+    ):
+        """Test that the first page of posts is read through indexes."""
+        response = authorized_client.get("/api/posts/", params={"limit": 25})
+        assert response.status_code == status.HTTP_200_OK
+
+        assert_no_sequential_scans(async_session_factory, executed_statements)
+
+    def test_user_listing(
+        self,
+        authorized_client,
+        async_session_factory,
+        seeded_data,
+        executed_statements,
+    ):
+        """Test that the posts of a user, and their count, use indexes."""
+        response = authorized_client.get(
+            "/api/posts/",
+            params={"user_id": str(seeded_data["user_id"]), "limit": 25},
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+        assert_no_sequential_scans(async_session_factory, executed_statements)
+
+    def test_single_post(
+        self,
+        authorized_client,
+        async_session_factory,
+        seeded_data,
+        executed_statements,
+    ):
+        """Test that a single post is read through an index."""
+        response = authorized_client.get(
+            f"/api/posts/{seeded_data['post_id']}"
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+        assert_no_sequential_scans(async_session_factory, executed_statements)
+
+    def test_vote(
+        self,
+        authorized_client,
+        async_session_factory,
+        seeded_data,
+        executed_statements,
+    ):
+        """Test that adding and removing votes go through indexes."""
+        for vote_status in (True, False):
+            response = authorized_client.post(
+                "/api/vote/",
+                json={
+                    "post_id": str(seeded_data["post_id"]),
+                    "status": vote_status,
+                },
+            )
+            assert response.status_code == status.HTTP_201_CREATED
+
+        assert_no_sequential_scans(async_session_factory, executed_statements)
+
+    def test_trending(
+        self,
+        authorized_client,
+        async_session_factory,
+        seeded_data,
+        executed_statements,
+    ):
+        """Test that deep pages of trending posts are read as key ranges."""
+
+        async def refresh():
+            async with async_session_factory() as db:
+                await crud_post.refresh_trending(db=db)
+                await db.commit()
+
+        asyncio.run(refresh())
+        response = authorized_client.get(
+            "/api/posts/trending", params={"limit": 100}
+        )
+        next_page = response.json()["metadata"]["links"]["next"]
+        executed_statements.clear()
+
+        response = authorized_client.get(next_page, params={"limit": 25})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["metadata"]["count"] == 25
+
+        assert_no_sequential_scans(async_session_factory, executed_statements)
+
+    @pytest.mark.parametrize("max_followers", [10000, 0])
+    def test_timeline(
+        self,
+        async_session_factory,
+        seeded_data,
+        executed_statements,
+        monkeypatch,
+        max_followers,
+    ):
+        """
+        Test that timelines are read through indexes, whether their posts
+        were fanned out or are pulled from their authors.
+        """
+        monkeypatch.setattr(
+            settings, "timeline_fanout_max_followers", max_followers
+        )
+
+        async def get_timeline():
+            async with async_session_factory() as db:
+                posts, _ = await crud_post.get_timeline(
+                    db=db, user_id=seeded_data["user_id"], limit=25
+                )
+            return posts
+
+        assert len(asyncio.run(get_timeline())) == 25
+
+        assert_no_sequential_scans(async_session_factory, executed_statements)
+
+    def test_votes_of_post(self, async_session_factory, seeded_data):
+        """Test that the votes of a post, as cascaded on delete, use an index."""
+        engine = async_session_factory.kw["bind"]
+        compiled = (
+            select(Vote)
+            .filter(Vote.post_id == seeded_data["post_id"])
+            .compile(dialect=engine.dialect)
+        )
+        parameters = tuple(
+            compiled.params[name] for name in compiled.positiontup
+        )
+
+        assert not get_sequential_scans(
+            async_session_factory, compiled.string, parameters
+        )
@@ -0,0 +1,123 @@
+from uuid import uuid4
+
+import pytest
+from fastapi import status
+from sqlalchemy import select
+
+from posts_app.models import User
+
+base_endpoint = "/api/follow/"
+timeline_endpoint = "/api/posts/timeline"
+
+
+pytestmark = pytest.mark.usefixtures("api_client", "session")
+
+
+def get_timeline_ids(client) -> list[str]:
+    response = client.get(timeline_endpoint)
+    assert response.status_code == status.HTTP_200_OK
+    return [post["post"]["id"] for post in response.json()["data"]]
+
+
+class TestFollows:
+    def test_follow_updates_follower_count(
+        self, authorized_client, session, test_author
+    ):
+        """Test that following and unfollowing updates the follower count."""
+
+        def get_follower_count() -> int:
+            count = session.scalar(
+                select(User.follower_count).filter(
+                    User.id == test_author["id"]
+                )
+            )
+            session.close()
+            return count
+
+        follow = {"user_id": test_author["id"], "status": True}
+        response = authorized_client.post(base_endpoint, json=follow)
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.json() == {"message": "User followed successfully"}
+        assert get_follower_count() == 1
+
+        response = authorized_client.post(
+            base_endpoint, json={**follow, "status": False}
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.json() == {"message": "User unfollowed successfully"}
+        assert get_follower_count() == 0
+
+    def test_follow_twice(self, authorized_client, test_author):
+        """Test that a user cannot follow the same user twice."""
+        follow = {"user_id": test_author["id"], "status": True}
+
+        authorized_client.post(base_endpoint, json=follow)
+        response = authorized_client.post(base_endpoint, json=follow)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {"detail": "You already follow this user"}
+
+    def test_unfollow_not_followed_user(self, authorized_client, test_author):
+        """Test that unfollowing a user that isn't followed fails."""
+        response = authorized_client.post(
+            base_endpoint,
+            json={"user_id": test_author["id"], "status": False},
+        )
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.json() == {"detail": "You don't follow this user"}
+
+    def test_follow_missing_user(self, authorized_client):
+        """Test that following a user that doesn't exist fails."""
+        response = authorized_client.post(
+            base_endpoint, json={"user_id": str(uuid4()), "status": True}
+        )
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.json() == {"detail": "User not found"}
+
+    def test_follow_yourself(self, authorized_client, test_user):
+        """Test that users cannot follow themselves."""
+        response = authorized_client.post(
+            base_endpoint, json={"user_id": test_user["id"], "status": True}
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {"detail": "You can't follow yourself"}
+
+
+class TestFollowsTimeline:
+    def test_follow_backfills_timeline(self, authorized_client, test_author):
+        """Test that following a user adds their posts to the timeline."""
+        post_ids = [
+            test_author["client"]
+            .post("/api/posts/", json={"title": f"Post {i}", "content": "."})
+            .json()["id"]
+            for i in range(3)
+        ]
+        assert get_timeline_ids(authorized_client) == []
+
+        authorized_client.post(
+            base_endpoint, json={"user_id": test_author["id"], "status": True}
+        )
+
+        assert get_timeline_ids(authorized_client) == post_ids[::-1]
+
+    def test_unfollow_removes_posts_from_timeline(
+        self, authorized_client, test_author
+    ):
+        """Test that unfollowing a user removes their posts."""
+        authorized_client.post(
+            base_endpoint, json={"user_id": test_author["id"], "status": True}
+        )
+        test_author["client"].post(
+            "/api/posts/", json={"title": "Post", "content": "."}
+        )
+        assert len(get_timeline_ids(authorized_client)) == 1
+
+        authorized_client.post(
+            base_endpoint,
+            json={"user_id": test_author["id"], "status": False},
+        )
+
+        assert get_timeline_ids(authorized_client) == []
@@ -0,0 +1,1018 @@
+import asyncio
+import csv
+import io
+from datetime import datetime, timedelta, timezone
+from uuid import UUID, uuid4
+
+import pytest
+from fastapi import status
+from sqlalchemy import delete, event, func, select, text, update
+
+from posts_app import schemas
+from posts_app.cache import run_invalidations
+from posts_app.config import settings
+from posts_app.crud import TRENDING_REFRESH_LOCK, crud_post
+from posts_app.models import Post, TimelineEntry, User
+from posts_app.utils import encode_cursor
+
+base_endpoint = "/api/posts/"
+
+
+pytestmark = pytest.mark.usefixtures("api_client", "session")
+
+
+class TestPostsCrud:
+    def test_create_post(self, authorized_client, test_user):
+        """Test that a post is created for the authenticated user."""
+        response = authorized_client.post(
+            base_endpoint, json={"title": "Title", "content": "Content"}
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        post = schemas.Post(**response.json())
+        assert post.title == "Title"
+        assert str(post.user.id) == test_user["id"]
+
+    def test_update_post(self, authorized_client, test_posts):
+        """Test that the owner can update a post."""
+        response = authorized_client.put(
+            f"{base_endpoint}{test_posts[0].id}",
+            json={"title": "New title", "content": "New content"},
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["title"] == "New title"
+
+    def test_partial_update_post(self, authorized_client, test_posts):
+        """Test that the owner can partially update a post."""
+        response = authorized_client.patch(
+            f"{base_endpoint}{test_posts[0].id}", json={"title": "Patched"}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["title"] == "Patched"
+        assert response.json()["content"] == test_posts[0].content
+
+    def test_delete_post(self, authorized_client, test_posts):
+        """Test that the owner can delete a post."""
+        url = f"{base_endpoint}{test_posts[0].id}"
+
+        response = authorized_client.delete(url)
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+
+        response = authorized_client.get(url)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_get_current_user_posts(self, authorized_client, test_posts):
+        """Test that the current user's posts are returned."""
+        response = authorized_client.get(f"{base_endpoint}me")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()) == len(test_posts)
+
+    def test_listing_includes_post_owner(
+        self, authorized_client, test_user, test_posts
+    ):
+        """Test that listed posts carry their owner's id and email."""
+        response = authorized_client.get(
+            base_endpoint, params={"user_id": test_user["id"]}
+        )
+
+        owners = {
+            (post["post"]["user"]["id"], post["post"]["user"]["email"])
+            for post in response.json()["data"]
+        }
+        assert owners == {(test_user["id"], test_user["email"])}
+
+
+class TestPostsBatch:
+    def test_create_posts(self, authorized_client, test_user):
+        """Test that a batch of posts is created in the order given."""
+        posts = [
+            {"title": f"Title {i}", "content": f"Content {i}"}
+            for i in range(3)
+        ]
+
+        response = authorized_client.post(
+            f"{base_endpoint}batch", json={"posts": posts}
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        created = [schemas.Post(**post) for post in response.json()]
+        assert [post.title for post in created] == [
+            post["title"] for post in posts
+        ]
+        assert {str(post.user.id) for post in created} == {test_user["id"]}
+
+        response = authorized_client.get(
+            base_endpoint, params={"user_id": test_user["id"]}
+        )
+        assert len(response.json()["data"]) == len(posts)
+
+    def test_create_too_many_posts(self, authorized_client):
+        """Test that batches are limited in size."""
+        posts = [{"title": "Title", "content": "Content"}] * 1001
+
+        response = authorized_client.post(
+            f"{base_endpoint}batch", json={"posts": posts}
+        )
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_delete_posts(self, authorized_client, test_posts):
+        """Test that only existing posts of the user are deleted."""
+        post_ids = [str(post.id) for post in test_posts[:2]]
+
+        response = authorized_client.post(
+            f"{base_endpoint}batch/delete",
+            json={"ids": [*post_ids, str(uuid4())]},
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert sorted(response.json()["deleted"]) == sorted(post_ids)
+        for post_id in post_ids:
+            response = authorized_client.get(f"{base_endpoint}{post_id}")
+            assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_delete_posts_of_another_user(
+        self, api_client, authorized_client, test_posts
+    ):
+        """Test that posts of other users are left alone."""
+        user = {
+            "email": f"{uuid4().hex}@email.com",
+            "password": "password1234",
+        }
+        api_client.post("/api/users/", json=user)
+        token = api_client.post(
+            "/api/login",
+            data={"username": user["email"], "password": user["password"]},
+        ).json()["access_token"]
+
+        response = api_client.post(
+            f"{base_endpoint}batch/delete",
+            json={"ids": [str(test_posts[0].id)]},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+        assert response.json() == {"deleted": []}
+        response = authorized_client.get(f"{base_endpoint}{test_posts[0].id}")
+        assert response.status_code == status.HTTP_200_OK
+
+
+class TestPostsExport:
+    @pytest.fixture(autouse=True)
+    def small_batches(self, monkeypatch):
+        # export the posts over several batches
+        monkeypatch.setattr(settings, "post_export_batch_size", 2)
+
+    def test_export_ndjson(self, authorized_client, test_user, test_posts):
+        """Test that posts are exported as JSON lines, oldest first."""
+        response = authorized_client.get(
+            f"{base_endpoint}export", params={"user_id": test_user["id"]}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"] == "application/x-ndjson"
+        posts = [
+            schemas.PostResponse.model_validate_json(line)
+            for line in response.text.splitlines()
+        ]
+        expected = sorted(
+            test_posts, key=lambda post: (post.created_at, post.id)
+        )
+        assert [post.post.id for post in posts] == [
+            post.id for post in expected
+        ]
+
+    def test_export_csv(self, authorized_client, test_user, test_posts):
+        """Test that posts are exported as CSV with a header row."""
+        response = authorized_client.get(
+            f"{base_endpoint}export",
+            params={"user_id": test_user["id"], "format": "csv"},
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert len(rows) == len(test_posts)
+        assert {row["user_email"] for row in rows} == {test_user["email"]}
+
+    def test_export_csv_without_posts(self, authorized_client, test_user):
+        """Test that an empty CSV export still has its header row."""
+        response = authorized_client.get(
+            f"{base_endpoint}export",
+            params={"user_id": test_user["id"], "format": "csv"},
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        reader = csv.DictReader(io.StringIO(response.text))
+        assert list(reader) == []
+        assert "user_email" in reader.fieldnames
+
+    def test_export_with_invalid_filter(self, authorized_client):
+        """Test that invalid filters fail before the export starts."""
+        response = authorized_client.get(
+            f"{base_endpoint}export", params={"votes": "many"}
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class TestPostsTrending:
+    @pytest.fixture
+    def refresh_trending(self, async_session_factory):
+        def refresh() -> bool:
+            async def run():
+                async with async_session_factory() as db:
+                    refreshed = await crud_post.refresh_trending(db=db)
+                    await db.commit()
+                return refreshed
+
+            return asyncio.run(run())
+
+        return refresh
+
+    @pytest.fixture
+    def trending_posts(self, session, test_user, refresh_trending):
+        # votes are counted in vote_count, setting it is enough to rank them
+        now = datetime.now(timezone.utc)
+        posts = [
+            Post(
+                title=f"Trending {votes}",
+                content="Hot",
+                user_id=test_user["id"],
+                vote_count=votes,
+                created_at=now - age,
+            )
+            for votes, age in [
+                (1_000_000, timedelta(hours=20)),
+                (900_000, timedelta(hours=1)),
+                (800_000, timedelta(hours=2)),
+                (5_000_000, timedelta(days=8)),
+                (0, timedelta(hours=1)),
+            ]
+        ]
+        session.add_all(posts)
+        session.commit()
+        post_ids = [str(post.id) for post in posts]
+        session.close()
+        refresh_trending()
+
+        yield post_ids
+
+        session.execute(delete(Post).filter(Post.id.in_(post_ids)))
+        session.commit()
+        session.close()
+        refresh_trending()
+
+    def test_posts_are_ranked_by_decayed_votes(
+        self, authorized_client, trending_posts
+    ):
+        """Test that recent votes outrank older ones in the trending feed."""
+        response = authorized_client.get(f"{base_endpoint}trending")
+
+        assert response.status_code == status.HTTP_200_OK
+        ids = [post["post"]["id"] for post in response.json()["data"]]
+        assert ids[:3] == [
+            trending_posts[1],
+            trending_posts[2],
+            trending_posts[0],
+        ]
+        # posts older than a week or without votes don't trend
+        assert trending_posts[3] not in ids
+        assert trending_posts[4] not in ids
+
+    def test_trending_pagination(self, authorized_client, trending_posts):
+        """Test that trending posts are paginated by score."""
+        response = authorized_client.get(
+            f"{base_endpoint}trending", params={"limit": 2}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        metadata = response.json()["metadata"]
+        first_page = [post["post"]["id"] for post in response.json()["data"]]
+        assert metadata["links"]["previous"] is None
+        assert metadata["total_count"] >= 3
+        assert metadata["total_count_estimated"]
+
+        response = authorized_client.get(metadata["links"]["next"])
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["data"][0]["post"]["id"] == trending_posts[0]
+        metadata = response.json()["metadata"]
+        assert metadata["current_page"] == 2
+
+        response = authorized_client.get(metadata["links"]["previous"])
+        assert response.status_code == status.HTTP_200_OK
+        assert [
+            post["post"]["id"] for post in response.json()["data"]
+        ] == first_page
+        assert response.json()["metadata"]["current_page"] == 1
+
+    def test_invalid_cursor(self, authorized_client):
+        # a cursor of the listing points to a date, not a score
+        cursor = encode_cursor(datetime.now(timezone.utc), uuid4(), 2)
+        response = authorized_client.get(
+            f"{base_endpoint}trending", params={"cursor": cursor}
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()["detail"] == "invalid cursor"
+
+    def test_refresh_keeps_unchanged_rows(
+        self, session, trending_posts, refresh_trending
+    ):
+        """
+        Test that refreshing the trending posts only rewrites the rows of
+        the posts that were voted on.
+        """
+
+        def get_row_versions() -> dict[str, str]:
+            rows = session.execute(
+                text("SELECT post_id::text, xmin::text FROM trending_posts")
+            ).all()
+            session.close()
+            return dict(rows)
+
+        versions = get_row_versions()
+        session.execute(
+            update(Post)
+            .filter(Post.id == trending_posts[0])
+            .values(vote_count=Post.vote_count + 1)
+        )
+        session.commit()
+        session.close()
+
+        assert refresh_trending()
+        refreshed_versions = get_row_versions()
+        assert refreshed_versions.pop(trending_posts[0]) != versions.pop(
+            trending_posts[0]
+        )
+        assert refreshed_versions == versions
+
+    def test_ranks_change_on_refresh(
+        self, authorized_client, session, trending_posts, refresh_trending
+    ):
+        """Test that trending posts are only ranked again on refresh."""
+        session.execute(
+            update(Post)
+            .filter(Post.id == trending_posts[0])
+            .values(vote_count=100_000_000)
+        )
+        session.commit()
+        session.close()
+
+        response = authorized_client.get(f"{base_endpoint}trending")
+        assert response.json()["data"][0]["post"]["id"] == trending_posts[1]
+
+        assert refresh_trending()
+        response = authorized_client.get(f"{base_endpoint}trending")
+        assert response.json()["data"][0]["post"]["id"] == trending_posts[0]
+
+    def test_concurrent_refresh_is_skipped(self, async_session_factory):
+        """Test that only one refresh of the trending posts runs at a time."""
+
+        async def refresh_while_locked() -> bool:
+            async with async_session_factory() as lock_db:
+                await lock_db.execute(
+                    select(func.pg_advisory_xact_lock(TRENDING_REFRESH_LOCK))
+                )
+                async with async_session_factory() as db:
+                    return await crud_post.refresh_trending(db=db)
+
+        assert not asyncio.run(refresh_while_locked())
+
+    def test_invalid_limit(self, authorized_client):
+        response = authorized_client.get(
+            f"{base_endpoint}trending", params={"limit": 0}
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()["detail"] == "invalid skip or limit"
+
+
+class TestPostsTimeline:
+    @pytest.fixture
+    def follow_author(self, authorized_client, test_author):
+        def follow():
+            response = authorized_client.post(
+                "/api/follow/",
+                json={"user_id": test_author["id"], "status": True},
+            )
+            assert response.status_code == status.HTTP_201_CREATED
+
+        return follow
+
+    @staticmethod
+    def create_posts(client, count: int) -> list[str]:
+        return [
+            client.post(
+                base_endpoint, json={"title": f"Post {i}", "content": "."}
+            ).json()["id"]
+            for i in range(count)
+        ]
+
+    def get_timeline_ids(self, client, **params) -> list[str]:
+        response = client.get(f"{base_endpoint}timeline", params=params)
+        assert response.status_code == status.HTTP_200_OK
+        return [post["post"]["id"] for post in response.json()["data"]]
+
+    def test_timeline_merges_followed_and_own_posts(
+        self, authorized_client, session, test_author, follow_author
+    ):
+        """Test that new posts of followed users are fanned out."""
+        follow_author()
+        author_posts = self.create_posts(test_author["client"], 2)
+        own_posts = self.create_posts(authorized_client, 1)
+        more_author_posts = self.create_posts(test_author["client"], 1)
+
+        assert self.get_timeline_ids(authorized_client) == (
+            more_author_posts + own_posts + author_posts[::-1]
+        )
+        fanned_out = session.scalar(
+            select(func.count())
+            .select_from(TimelineEntry)
+            .filter(TimelineEntry.author_id == test_author["id"])
+        )
+        session.close()
+        assert fanned_out == 3
+
+    def test_popular_authors_are_merged_on_read(
+        self,
+        authorized_client,
+        session,
+        test_author,
+        follow_author,
+        monkeypatch,
+    ):
+        """Test that posts of authors with many followers are pulled."""
+        monkeypatch.setattr(settings, "timeline_fanout_max_followers", 0)
+        follow_author()
+        author_posts = self.create_posts(test_author["client"], 3)
+
+        assert self.get_timeline_ids(authorized_client) == author_posts[::-1]
+        fanned_out = session.scalar(
+            select(func.count())
+            .select_from(TimelineEntry)
+            .filter(TimelineEntry.author_id == test_author["id"])
+        )
+        session.close()
+        assert fanned_out == 0
+
+    def test_large_batches_are_merged_on_read(
+        self,
+        authorized_client,
+        session,
+        test_author,
+        follow_author,
+        monkeypatch,
+    ):
+        """
+        Test that batches too large to fan out switch their author to being
+        merged on read.
+        """
+        monkeypatch.setattr(settings, "timeline_fanout_max_entries", 2)
+        follow_author()
+        post_ids = self.create_posts(test_author["client"], 1)
+        response = test_author["client"].post(
+            f"{base_endpoint}batch",
+            json={
+                "posts": [
+                    {"title": f"Batch {i}", "content": "."} for i in range(3)
+                ]
+            },
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        post_ids += [post["id"] for post in response.json()]
+        post_ids += self.create_posts(test_author["client"], 1)
+
+        # posts of a batch share their creation time
+        timeline = self.get_timeline_ids(authorized_client)
+        assert timeline[0] == post_ids[-1]
+        assert timeline[-1] == post_ids[0]
+        assert sorted(timeline) == sorted(post_ids)
+        fanned_out = session.scalar(
+            select(func.count())
+            .select_from(TimelineEntry)
+            .filter(TimelineEntry.author_id == test_author["id"])
+        )
+        fan_out_on_read = session.scalar(
+            select(User.fan_out_on_read).filter(User.id == test_author["id"])
+        )
+        session.close()
+        assert fanned_out == 1
+        assert fan_out_on_read
+
+    def test_formerly_popular_author_stays_merged_on_read(
+        self,
+        authorized_client,
+        session,
+        test_author,
+        follow_author,
+        monkeypatch,
+    ):
+        """
+        Test that posts left out while their author had too many followers
+        stay in timelines once the author is back under the threshold.
+        """
+        follow_author()
+        monkeypatch.setattr(settings, "timeline_fanout_max_followers", 0)
+        author_posts = self.create_posts(test_author["client"], 2)
+        monkeypatch.setattr(settings, "timeline_fanout_max_followers", 10000)
+        author_posts += self.create_posts(test_author["client"], 1)
+
+        assert self.get_timeline_ids(authorized_client) == author_posts[::-1]
+        fan_out_on_read = session.scalar(
+            select(User.fan_out_on_read).filter(User.id == test_author["id"])
+        )
+        session.close()
+        assert fan_out_on_read
+
+    def test_author_becoming_popular_is_not_duplicated(
+        self, authorized_client, test_author, follow_author, monkeypatch
+    ):
+        """Test that posts both fanned out and pulled are listed once."""
+        follow_author()
+        author_posts = self.create_posts(test_author["client"], 2)
+        monkeypatch.setattr(settings, "timeline_fanout_max_followers", 0)
+        author_posts += self.create_posts(test_author["client"], 1)
+
+        assert self.get_timeline_ids(authorized_client) == author_posts[::-1]
+
+    def test_walk_timeline_with_cursors(
+        self, authorized_client, test_author, follow_author, monkeypatch
+    ):
+        """Test that every post is listed once walking the timeline."""
+        follow_author()
+        post_ids = self.create_posts(test_author["client"], 3)
+        monkeypatch.setattr(settings, "timeline_fanout_max_followers", 0)
+        post_ids += self.create_posts(authorized_client, 2)
+        post_ids += self.create_posts(test_author["client"], 2)
+
+        seen, url = [], f"{base_endpoint}timeline?limit=2"
+        while url:
+            response = authorized_client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            seen += [post["post"]["id"] for post in response.json()["data"]]
+            url = response.json()["metadata"]["links"]["next"]
+
+        assert seen == post_ids[::-1]
+
+    def test_timeline_previous_cursor(self, authorized_client):
+        """Test that timelines can't be read backwards."""
+        cursor = encode_cursor(
+            datetime.now(timezone.utc), uuid4(), 2, "previous"
+        )
+        response = authorized_client.get(
+            f"{base_endpoint}timeline", params={"cursor": cursor}
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()["detail"] == "invalid cursor"
+
+
+class TestPostsCaching:
+    def test_created_post_shows_up_in_cached_listing(
+        self, authorized_client, test_user, test_posts
+    ):
+        """Test that creating a post invalidates the cached listings."""
+        params = {"user_id": test_user["id"]}
+        response = authorized_client.get(base_endpoint, params=params)
+        assert len(response.json()["data"]) == len(test_posts)
+
+        authorized_client.post(
+            base_endpoint, json={"title": "Title", "content": "Content"}
+        )
+
+        response = authorized_client.get(base_endpoint, params=params)
+        assert len(response.json()["data"]) == len(test_posts) + 1
+
+    def test_updated_post_is_not_served_from_cache(
+        self, authorized_client, test_posts
+    ):
+        """Test that updating a post invalidates its cached response."""
+        url = f"{base_endpoint}{test_posts[0].id}"
+        authorized_client.get(url)
+
+        authorized_client.patch(url, json={"title": "Patched"})
+
+        response = authorized_client.get(url)
+        assert response.json()["post"]["title"] == "Patched"
+
+    def test_read_before_commit_is_not_left_cached(
+        self, authorized_client, async_session_factory, test_user, test_posts
+    ):
+        """
+        Test that a post read, and cached, between a write and its commit
+        isn't served once the write is committed.
+        """
+        url = f"{base_endpoint}{test_posts[0].id}"
+        params = {"user_id": test_user["id"]}
+
+        async def update_post():
+            async with async_session_factory() as db:
+                await crud_post.partial_update(
+                    db=db,
+                    schema=schemas.PostPartialUpdate(title="Patched"),
+                    post_id=str(test_posts[0].id),
+                    user_id=UUID(test_user["id"]),
+                )
+                # concurrent requests still read the committed post
+                response = authorized_client.get(url)
+                assert response.json()["post"]["title"] == "Post 0"
+                authorized_client.get(base_endpoint, params=params)
+
+                await db.commit()
+                await run_invalidations(db)
+
+        asyncio.run(update_post())
+
+        response = authorized_client.get(url)
+        assert response.json()["post"]["title"] == "Patched"
+        response = authorized_client.get(base_endpoint, params=params)
+        titles = [post["post"]["title"] for post in response.json()["data"]]
+        assert "Patched" in titles
+
+
+class TestPostsConditionalRequests:
+    def test_matching_etag_returns_not_modified(
+        self, authorized_client, test_posts
+    ):
+        """Test that a post the client already has isn't sent again."""
+        url = f"{base_endpoint}{test_posts[0].id}"
+        etag = authorized_client.get(url).headers["etag"]
+
+        response = authorized_client.get(url, headers={"If-None-Match": etag})
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.headers["etag"] == etag
+        assert response.content == b""
+
+    def test_vote_changes_post_etag(self, authorized_client, test_posts):
+        """Test that a new vote makes the client's copy stale."""
+        url = f"{base_endpoint}{test_posts[0].id}"
+        etag = authorized_client.get(url).headers["etag"]
+
+        authorized_client.post(
+            "/api/vote/",
+            json={"post_id": str(test_posts[0].id), "status": True},
+        )
+        response = authorized_client.get(url, headers={"If-None-Match": etag})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["etag"] != etag
+        assert response.json()["votes"] == 1
+
+    def test_listing_etag(self, authorized_client, test_user, test_posts):
+        """Test that listings can be revalidated as well."""
+        params = {"user_id": test_user["id"]}
+        etag = authorized_client.get(base_endpoint, params=params).headers[
+            "etag"
+        ]
+
+        response = authorized_client.get(
+            base_endpoint, params=params, headers={"If-None-Match": etag}
+        )
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+class TestPostsPagination:
+    def test_first_page_has_next_link_only(
+        self, authorized_client, test_user, test_posts
+    ):
+        """Test that the first page links only to the next page."""
+        response = authorized_client.get(
+            base_endpoint, params={"user_id": test_user["id"], "limit": 3}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        posts = schemas.PostsList(**response.json())
+        assert len(posts.data) == 3
+        assert posts.metadata.links.next is not None
+        assert posts.metadata.links.previous is None
+
+    def test_walk_pages_with_cursors(
+        self, authorized_client, test_user, test_posts
+    ):
+        """Test that following the cursors visits every post once."""
+        url = f"{base_endpoint}?user_id={test_user['id']}&limit=3"
+        seen = []
+        while url:
+            response = authorized_client.get(str(url))
+            assert response.status_code == status.HTTP_200_OK
+            posts = schemas.PostsList(**response.json())
+            seen.extend(post.post.id for post in posts.data)
+            url = posts.metadata.links.next
+
+        expected = sorted(
+            test_posts, key=lambda post: (post.created_at, post.id)
+        )
+        assert seen == [post.id for post in reversed(expected)]
+
+    def test_previous_link_returns_previous_page(
+        self, authorized_client, test_user, test_posts
+    ):
+        """Test that the previous link goes back to the page before."""
+        params = {"user_id": test_user["id"], "limit": 3}
+        first_page = authorized_client.get(base_endpoint, params=params)
+        second_page = authorized_client.get(
+            first_page.json()["metadata"]["links"]["next"]
+        )
+        previous_page = authorized_client.get(
+            second_page.json()["metadata"]["links"]["previous"]
+        )
+
+        assert previous_page.json()["data"] == first_page.json()["data"]
+        assert previous_page.json()["metadata"]["links"]["previous"] is None
+
+    def test_exact_pagination_metadata(
+        self, authorized_client, test_user, test_posts
+    ):
+        """Test that an exact count numbers the pages as they are walked."""
+        params = {
+            "user_id": test_user["id"],
+            "limit": 3,
+            "count_mode": "exact",
+        }
+        first_page = authorized_client.get(
+            base_endpoint, params=params
+        ).json()
+        second_page = authorized_client.get(
+            first_page["metadata"]["links"]["next"]
+        ).json()
+
+        for page, current_page in ((first_page, 1), (second_page, 2)):
+            assert page["metadata"]["total_count"] == len(test_posts)
+            assert page["metadata"]["total_count_estimated"] is False
+            assert page["metadata"]["total_pages"] == 3
+            assert page["metadata"]["current_page"] == current_page
+
+    def test_estimated_count_of_filtered_posts(
+        self, authorized_client, test_user, test_posts
+    ):
+        """Test that filtered listings are counted by default."""
+        response = authorized_client.get(
+            base_endpoint, params={"user_id": test_user["id"], "limit": 3}
+        )
+
+        metadata = response.json()["metadata"]
+        assert metadata["total_count"] == len(test_posts)
+        assert metadata["total_count_estimated"] is True
+
+    def test_offset_pagination_links(
+        self, authorized_client, test_user, test_posts
+    ):
+        """Test that pages fetched with `skip` link to their neighbours."""
+        response = authorized_client.get(
+            base_endpoint,
+            params={
+                "user_id": test_user["id"],
+                "limit": 3,
+                "skip": 3,
+                "count_mode": "exact",
+            },
+        )
+
+        metadata = response.json()["metadata"]
+        assert metadata["current_page"] == 2
+        assert metadata["total_pages"] == 3
+        assert "skip=6" in metadata["links"]["next"]
+        assert "skip=0" in metadata["links"]["previous"]
+
+    def test_invalid_count_mode(self, authorized_client):
+        """Test that unknown count modes are rejected."""
+        response = authorized_client.get(
+            base_endpoint, params={"count_mode": "approximate"}
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {"detail": "invalid count mode"}
+
+    def test_invalid_cursor(self, authorized_client):
+        """Test that a tampered cursor is rejected."""
+        response = authorized_client.get(
+            base_endpoint, params={"cursor": "not-a-cursor"}
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {"detail": "invalid cursor"}
+
+
+class TestPostsSearch:
+    @pytest.fixture
+    def search_posts(self, session, test_user):
+        posts = [
+            Post(
+                title="Cooking for beginners",
+                content="Start with gardening your own herbs.",
+                user_id=test_user["id"],
+            ),
+            Post(
+                title="Gardening tips",
+                content="Water your plants early in the gardening season.",
+                user_id=test_user["id"],
+            ),
+            Post(
+                title="Travel notes",
+                content="Nothing about plants here.",
+                user_id=test_user["id"],
+            ),
+        ]
+        session.add_all(posts)
+        session.commit()
+        post_ids = [str(post.id) for post in posts]
+        session.close()
+
+        return post_ids
+
+    def test_fulltext_search_is_ranked(
+        self, authorized_client, test_user, search_posts
+    ):
+        """Test that full text results are ordered by relevance."""
+        response = authorized_client.get(
+            base_endpoint,
+            params={"user_id": test_user["id"], "search": "gardening"},
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        ids = [post["post"]["id"] for post in response.json()["data"]]
+        assert ids == [search_posts[1], search_posts[0]]
+
+    def test_fulltext_search_matches_word_forms(
+        self, authorized_client, test_user, search_posts
+    ):
+        """Test that full text search matches stemmed words."""
+        response = authorized_client.get(
+            base_endpoint,
+            params={"user_id": test_user["id"], "search": "plant"},
+        )
+
+        ids = {post["post"]["id"] for post in response.json()["data"]}
+        assert ids == {search_posts[1], search_posts[2]}
+
+    def test_contains_search_mode(
+        self, authorized_client, test_user, search_posts
+    ):
+        """Test that the contains mode matches substrings."""
+        response = authorized_client.get(
+            base_endpoint,
+            params={
+                "user_id": test_user["id"],
+                "search": "arden",
+                "search_mode": "contains",
+            },
+        )
+
+        ids = {post["post"]["id"] for post in response.json()["data"]}
+        assert ids == {search_posts[0], search_posts[1]}
+
+    def test_invalid_search_mode(self, authorized_client):
+        """Test that an unknown search mode is rejected."""
+        response = authorized_client.get(
+            base_endpoint, params={"search": "plants", "search_mode": "regex"}
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {"detail": "invalid search mode"}
+
+
+class TestPostsQueryCount:
+    @pytest.fixture
+    def posts_by_many_users(self, session):
+        users = [
+            User(email=f"{uuid4().hex}@email.com", password="password1234")
+            for _ in range(5)
+        ]
+        session.add_all(users)
+        session.flush()
+        posts = [
+            Post(title="Title", content="Content", user_id=user.id)
+            for user in users
+        ]
+        session.add_all(posts)
+        session.commit()
+        post_ids = [post.id for post in posts]
+        session.close()
+
+        return post_ids
+
+    @pytest.fixture
+    def statements(self, async_session_factory):
+        """Records the SQL statements run by the API's database sessions."""
+        statements = []
+        engine = async_session_factory.kw["bind"].sync_engine
+
+        def record_statement(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record_statement)
+        yield statements
+        event.remove(engine, "before_cursor_execute", record_statement)
+
+    @pytest.mark.parametrize(
+        "params", [{"search": ""}, {"search": "", "search_mode": "contains"}]
+    )
+    def test_empty_search_is_not_counted(
+        self, authorized_client, posts_by_many_users, statements, params
+    ):
+        """Test that an empty search is estimated as an unfiltered listing."""
+        response = authorized_client.get(base_endpoint, params={"limit": 2})
+        unfiltered_count = response.json()["metadata"]["total_count"]
+        statements.clear()
+
+        response = authorized_client.get(
+            base_endpoint, params={"limit": 2, **params}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        metadata = response.json()["metadata"]
+        assert metadata["total_count"] == unfiltered_count
+        assert metadata["total_count_estimated"] is True
+        assert not any("count(" in statement for statement in statements)
+
+    @pytest.mark.parametrize("user_loading", ["joined", "selectin"])
+    def test_owners_are_loaded_eagerly(
+        self,
+        async_session_factory,
+        posts_by_many_users,
+        statements,
+        user_loading,
+    ):
+        """Test that listing more posts doesn't run more statements."""
+
+        async def get_owner_emails(limit):
+            async with async_session_factory() as db:
+                posts = await crud_post.get_all(
+                    db=db, user_loading=user_loading, limit=limit
+                )
+            # owners are read after the session is closed
+            return [post.user.email for post, _ in posts]
+
+        counts = []
+        for limit in (1, len(posts_by_many_users)):
+            statements.clear()
+            assert len(asyncio.run(get_owner_emails(limit))) == limit
+            counts.append(len(statements))
+
+        assert counts[0] == counts[1]
+
+    @pytest.mark.parametrize("user_loading", ["joined", "selectin"])
+    def test_post_owner_is_loaded_eagerly(
+        self, async_session_factory, posts_by_many_users, user_loading
+    ):
+        """Test that a single post is returned along with its owner."""
+
+        async def get_post():
+            async with async_session_factory() as db:
+                return await crud_post.get_by_id(
+                    db=db,
+                    post_id=str(posts_by_many_users[0]),
+                    user_loading=user_loading,
+                )
+
+        post, votes = asyncio.run(get_post())
+
+        assert post.user.id == post.user_id
+        assert votes == 0
+
+    def test_create_post_in_a_single_statement(
+        self, authorized_client, statements
+    ):
+        """Test that generated columns come back with the insert."""
+        response = authorized_client.post(
+            base_endpoint, json={"title": "Title", "content": "Content"}
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        # an author without followers has nothing to fan out
+        post_statements = [
+            statement for statement in statements if "posts" in statement
+        ]
+        assert len(post_statements) == 1
+        assert post_statements[0].startswith("INSERT INTO posts")
+        assert "RETURNING" in post_statements[0]
+
+    def test_listing_reports_its_queries(
+        self, authorized_client, posts_by_many_users, statements
+    ):
+        """Test that the queries of a request show up in its timings."""
+        response = authorized_client.get(base_endpoint, params={"limit": 2})
+
+        server_timing = response.headers["server-timing"]
+        assert f'db;desc="{len(statements)} queries"' in server_timing
+
+    def test_listing_statement_count_is_constant(
+        self, authorized_client, posts_by_many_users, statements
+    ):
+        """Test that the listing runs as many statements for any page size."""
+        authorized_client.get(base_endpoint, params={"limit": 1})
+
+        counts = []
+        for limit in (2, len(posts_by_many_users)):
+            statements.clear()
+            response = authorized_client.get(
+                base_endpoint, params={"limit": limit}
+            )
+            assert len(response.json()["data"]) == limit
+            counts.append(len(statements))
+
+        assert counts[0] == counts[1]
@@ -2,6 +2,7 @@ import pytest
 from fastapi import status
 
 from posts_app import schemas
+from posts_app.utils import password_hasher
 
 base_endpoint = "/api/users"
 
@@ -17,6 +18,31 @@ class TestUserAccountRetrievals:
         assert response.json() == {"detail": "Not authenticated"}
 
 
+class TestUserConditionalRequests:
+    def test_not_modified_since_last_modified(
+        self, authorized_client, test_user
+    ):
+        """Test that an unchanged user isn't sent again."""
+        url = f"{base_endpoint}/{test_user['id']}"
+        last_modified = authorized_client.get(url).headers["last-modified"]
+
+        response = authorized_client.get(
+            url, headers={"If-Modified-Since": last_modified}
+        )
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_modified_since_old_date(self, authorized_client, test_user):
+        """Test that a user changed after the given date is sent."""
+        response = authorized_client.get(
+            f"{base_endpoint}/{test_user['id']}",
+            headers={"If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"},
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["id"] == test_user["id"]
+
+
 class TestUserAccountCreation:
     def test_create_user(self, api_client):
         """Test the creation of a single user."""
@@ -134,3 +160,66 @@ class TestUserAccountCreation:
         )
 
         assert response.status_code == expected
+
+
+class TestPasswordHashingBackpressure:
+    @pytest.fixture
+    def busy_hasher(self, monkeypatch):
+        monkeypatch.setattr(
+            password_hasher, "pending", password_hasher.max_pending
+        )
+
+    def test_create_user_when_hasher_is_busy(self, api_client, busy_hasher):
+        """Test that sign ups are turned away while hashing is saturated."""
+        response = api_client.post(
+            base_endpoint,
+            json={"email": "busy@email.com", "password": "password1234"},
+        )
+
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert response.headers["Retry-After"] == "1"
+
+    def test_update_user_when_hasher_is_busy(
+        self, authorized_client, test_user, busy_hasher
+    ):
+        """Test that updates are turned away while hashing is saturated."""
+        response = authorized_client.put(
+            f"{base_endpoint}/{test_user['id']}",
+            json={"email": test_user["email"], "password": "password1234"},
+        )
+
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert response.headers["Retry-After"] == "1"
+
+
+class TestUserAccountUpdates:
+    def test_update_user_refreshes_current_user(
+        self, authorized_client, test_user
+    ):
+        """Test that the current user reflects an update right away."""
+        response = authorized_client.get(f"{base_endpoint}/me")
+        assert response.json()["email"] == test_user["email"]
+
+        new_email = f"updated.{test_user['email']}"
+        response = authorized_client.put(
+            f"{base_endpoint}/{test_user['id']}",
+            json={"email": new_email, "password": "password1234"},
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+        response = authorized_client.get(f"{base_endpoint}/me")
+        assert response.json()["email"] == new_email
+
+    def test_deleted_user_is_not_authenticated(
+        self, authorized_client, test_user
+    ):
+        """Test that a deleted user can't keep using their token."""
+        authorized_client.get(f"{base_endpoint}/me")
+
+        response = authorized_client.delete(
+            f"{base_endpoint}/{test_user['id']}"
+        )
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+
+        response = authorized_client.get(f"{base_endpoint}/me")
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
@@ -0,0 +1,142 @@
+from uuid import uuid4
+
+import pytest
+from fastapi import status
+
+base_endpoint = "/api/vote/"
+
+
+pytestmark = pytest.mark.usefixtures("api_client", "session")
+
+
+class TestVoteCount:
+    def test_vote_updates_post_vote_count(
+        self, authorized_client, test_posts
+    ):
+        """Test that adding and removing a vote updates the post votes."""
+        post_id = str(test_posts[0].id)
+
+        response = authorized_client.post(
+            base_endpoint, json={"post_id": post_id, "status": True}
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        response = authorized_client.get(f"/api/posts/{post_id}")
+        assert response.json()["votes"] == 1
+
+        response = authorized_client.post(
+            base_endpoint, json={"post_id": post_id, "status": False}
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        response = authorized_client.get(f"/api/posts/{post_id}")
+        assert response.json()["votes"] == 0
+
+    def test_vote_twice(self, authorized_client, test_posts):
+        """Test that a user cannot vote twice on the same post."""
+        vote = {"post_id": str(test_posts[0].id), "status": True}
+
+        authorized_client.post(base_endpoint, json=vote)
+        response = authorized_client.post(base_endpoint, json=vote)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {
+            "detail": "You have already voted on this post"
+        }
+
+    def test_delete_missing_vote(self, authorized_client, test_posts):
+        """Test that removing a vote that doesn't exist fails."""
+        response = authorized_client.post(
+            base_endpoint,
+            json={"post_id": str(test_posts[0].id), "status": False},
+        )
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.json() == {"detail": "Vote does not exist."}
+
+    def test_vote_on_missing_post(self, authorized_client):
+        """Test that voting on a post that doesn't exist fails."""
+        response = authorized_client.post(
+            base_endpoint, json={"post_id": str(uuid4()), "status": True}
+        )
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.json() == {"detail": "Post not found"}
+
+
+class TestVoteBatch:
+    def test_batch_adds_and_deletes_votes(
+        self, authorized_client, test_posts
+    ):
+        """Test that a batch applies every vote and reports each outcome."""
+        voted, unvoted, missing = (
+            str(test_posts[0].id),
+            str(test_posts[1].id),
+            str(uuid4()),
+        )
+        authorized_client.post(
+            base_endpoint, json={"post_id": voted, "status": True}
+        )
+
+        response = authorized_client.post(
+            f"{base_endpoint}batch",
+            json={
+                "votes": [
+                    {"post_id": unvoted, "status": True},
+                    {"post_id": voted, "status": False},
+                    {"post_id": missing, "status": True},
+                ]
+            },
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [item["result"] for item in response.json()["results"]] == [
+            "added",
+            "deleted",
+            "post not found",
+        ]
+        assert (
+            authorized_client.get(f"/api/posts/{unvoted}").json()["votes"]
+            == 1
+        )
+        assert (
+            authorized_client.get(f"/api/posts/{voted}").json()["votes"] == 0
+        )
+
+    def test_batch_reports_unchanged_votes(
+        self, authorized_client, test_posts
+    ):
+        """Test that repeated and missing votes are reported, not failed."""
+        voted, unvoted = str(test_posts[0].id), str(test_posts[1].id)
+        authorized_client.post(
+            base_endpoint, json={"post_id": voted, "status": True}
+        )
+
+        response = authorized_client.post(
+            f"{base_endpoint}batch",
+            json={
+                "votes": [
+                    {"post_id": voted, "status": True},
+                    {"post_id": unvoted, "status": False},
+                ]
+            },
+        )
+
+        assert [item["result"] for item in response.json()["results"]] == [
+            "already voted",
+            "vote not found",
+        ]
+
+    def test_batch_with_duplicate_posts(self, authorized_client, test_posts):
+        """Test that a post can't be voted on twice in the same batch."""
+        post_id = str(test_posts[0].id)
+
+        response = authorized_client.post(
+            f"{base_endpoint}batch",
+            json={
+                "votes": [
+                    {"post_id": post_id, "status": True},
+                    {"post_id": post_id, "status": False},
+                ]
+            },
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+from fastapi import HTTPException, status
+
+from posts_app.utils import PasswordHasher
+
+
+def test_password_hasher_runs_jobs():
+    hasher = PasswordHasher(workers=1, queue_size=0)
+
+    assert asyncio.run(hasher.run(sum, [1, 2])) == 3
+
+
+def test_password_hasher_rejects_jobs_when_full():
+    hasher = PasswordHasher(workers=1, queue_size=1)
+
+    async def run_jobs():
+        return await asyncio.gather(
+            *(hasher.run(time.sleep, 0.1) for _ in range(3)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run_jobs())
+
+    assert results[:2] == [None, None]
+    assert isinstance(results[2], HTTPException)
+    assert results[2].status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert hasher.pending == 0